@@ -11,6 +11,7 @@ from __future__ import annotations
 import abc
 import typing
 
+import numpy as np
 from pydantic import BaseModel
 
 from pyoma2.algorithms.data.result import BaseResult
@@ -139,6 +140,16 @@ class BaseAlgorithm(typing.Generic[T_RunParams, T_Result, T_Data], abc.ABC):
                 "use a Setup class to run it"
             )
 
+    def _channels_first(self) -> np.ndarray:
+        """
+        Single setup data in the C-contiguous (channels, samples) layout used by the
+        algorithms, so that segmenting and correlating it reads contiguous rows.
+
+        The array is meant to be a local of `run`: it is not kept on the instance, so
+        that no copy of the data outlives the run.
+        """
+        return np.ascontiguousarray(self.data.T)
+
     @abc.abstractmethod
     def run(self) -> T_Result:
         """
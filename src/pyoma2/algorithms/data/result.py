@@ -44,12 +44,15 @@ class FDDResult(BaseResult):
         Singular values of the PSD.
     S_vec : numpy.NDArray
         Singular vectors of the PSD.
+    S_val_db : numpy.NDArray
+        Singular values of the PSD in dB, as plotted by the CMIF.
     """
 
     freq: Optional[npt.NDArray[np.float64]] = None
     Sy: Optional[npt.NDArray[np.float64]] = None
     S_val: Optional[npt.NDArray[np.float64]] = None
     S_vec: Optional[npt.NDArray[np.float64]] = None
+    S_val_db: Optional[npt.NDArray[np.float32]] = None
 
 
 class EFDDResult(FDDResult):
@@ -67,6 +70,8 @@ class EFDDResult(FDDResult):
         Singular values of the PSD.
     S_vec : numpy.NDArray
         Singular vectors of the PSD.
+    S_val_db : numpy.NDArray
+        Singular values of the PSD in dB, as plotted by the CMIF.
     Xi : numpy.NDArray
         Array of damping ratios obtained from modal analysis.
     forPlot : list
@@ -48,6 +48,15 @@ class FDDRunParams(BaseRunParams):
         Method used for spectral density estimation, default is "per".
     pov : float, optional
         Percentage of overlap between segments (only for "per"), default is 0.5.
+    compute_vectors : bool, optional
+        Whether to compute the singular vectors of the spectral density matrix
+        during ``run``, default is False. When False only the singular values
+        (e.g. for the CMIF plot) are computed, and the vectors are obtained on
+        demand by the ``mpe`` methods.
+    dtype : str, optional ["complex128", "complex64"]
+        Data type of the spectral density matrix, default is "complex128".
+        "complex64" halves the memory footprint of the spectral density matrix
+        and speeds up its decomposition, at the cost of single precision.
     sel_freq : numpy.ndarray
         Array of selected frequencies for modal parameter estimation,.
     DF : float, optional
@@ -62,6 +71,8 @@ class FDDRunParams(BaseRunParams):
     nxseg: int = 1024
     method_SD: Literal["per", "cor"] = "per"
     pov: float = 0.5
+    compute_vectors: bool = False
+    dtype: Literal["complex128", "complex64"] = "complex128"
     # METODO 2: mpe e mpe_from_plot
     sel_freq: Optional[npt.NDArray[np.float64]] = None
     DF: float = 0.1
@@ -79,6 +90,15 @@ class EFDDRunParams(BaseRunParams):
         Method used for spectral density estimation, default is "per".
     pov : float, optional
         Percentage of overlap between segments (only for "per"), default is 0.5.
+    compute_vectors : bool, optional
+        Whether to compute the singular vectors of the spectral density matrix
+        during ``run``, default is False. When False only the singular values
+        (e.g. for the CMIF plot) are computed, and the vectors are obtained on
+        demand by the ``mpe`` methods.
+    dtype : str, optional ["complex128", "complex64"]
+        Data type of the spectral density matrix, default is "complex128".
+        "complex64" halves the memory footprint of the spectral density matrix
+        and speeds up its decomposition, at the cost of single precision.
     sel_freq : numpy.ndarray
         Array of selected frequencies for modal parameter estimation,.
     DF1 : float, optional
@@ -103,6 +123,8 @@ class EFDDRunParams(BaseRunParams):
     nxseg: int = 1024
     method_SD: Literal["per", "cor"] = "per"
     pov: float = 0.5
+    compute_vectors: bool = False
+    dtype: Literal["complex128", "complex64"] = "complex128"
     # METODO 2: mpe e mpe_from_plot
     sel_freq: Optional[npt.NDArray[np.float64]] = None
     DF1: float = 0.1
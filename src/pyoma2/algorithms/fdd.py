@@ -58,14 +58,31 @@ class FDD(BaseAlgorithm[FDDRunParams, FDDResult, typing.Iterable[float]]):
             An object containing frequency spectrum, spectral density matrix, singular values,
             and vectors as analysis results.
         """
-        Y = self.data.T
+        Y = self._channels_first()
         nxseg = self.run_params.nxseg
         method = self.run_params.method_SD
         pov = self.run_params.pov
+        dtype = self.run_params.dtype
         # self.run_params.df = 1 / dt / nxseg
 
-        freq, Sy = fdd.SD_est(Y, Y, self.dt, nxseg, method=method, pov=pov)
-        Sval, Svec = fdd.SD_svalsvec(Sy)
+        if method == "per" and not self.run_params.compute_vectors:
+            # Keep the segment spectra: with fewer segments than channels the
+            # singular values are cheaper to get from them than from Sy
+            freq, F, scale = fdd.SD_stft(Y, self.dt, nxseg, pov=pov, dtype=dtype)
+            Sy = fdd.SD_from_stft(F, F, scale)
+            if F.shape[1] < F.shape[0]:
+                Sval = fdd.SD_svals_from_stft(F, scale)
+            else:
+                Sval = fdd.SD_svals(Sy)
+            Svec = None
+        else:
+            freq, Sy = fdd.SD_est(
+                Y, Y, self.dt, nxseg, method=method, pov=pov, dtype=dtype
+            )
+            if self.run_params.compute_vectors:
+                Sval, Svec = fdd.SD_svalsvec(Sy)
+            else:
+                Sval, Svec = fdd.SD_svals(Sy), None
 
         # Return results
         return self.ResultCls(
@@ -73,8 +90,21 @@ class FDD(BaseAlgorithm[FDDRunParams, FDDResult, typing.Iterable[float]]):
             Sy=Sy,
             S_val=Sval,
             S_vec=Svec,
+            S_val_db=fdd.SD_svals_db(Sval),
         )
 
+    def _compute_S_vec(self) -> None:
+        """
+        Computes the singular vectors of the spectral density matrix if ``run`` did not.
+
+        The singular vectors are only needed for modal parameter estimation, so ``run``
+        skips them unless ``compute_vectors`` is set in the run parameters. The singular
+        values (and their dB values) are replaced by the ones of the same decomposition.
+        """
+        if self.result.S_vec is None:
+            self.result.S_val, self.result.S_vec = fdd.SD_svalsvec(self.result.Sy)
+            self.result.S_val_db = fdd.SD_svals_db(self.result.S_val)
+
     def mpe(self, sel_freq: typing.List[float], DF: float = 0.1) -> typing.Any:
         """
         Performs Modal Parameter Estimation (mpe) on selected frequencies using FDD results.
@@ -100,6 +130,7 @@ class FDD(BaseAlgorithm[FDDRunParams, FDDResult, typing.Iterable[float]]):
         self.run_params.sel_freq = sel_freq
         self.run_params.DF = DF
         # Sy = self.result.Sy
+        self._compute_S_vec()
         S_val = self.result.S_val
         S_vec = self.result.S_vec
         freq = self.result.freq
@@ -137,6 +168,7 @@ class FDD(BaseAlgorithm[FDDRunParams, FDDResult, typing.Iterable[float]]):
         super().mpe_from_plot(freqlim=freqlim)
 
         # Sy = self.result.Sy
+        self._compute_S_vec()
         S_val = self.result.S_val
         S_vec = self.result.S_vec
         freq = self.result.freq
@@ -187,7 +219,11 @@ class FDD(BaseAlgorithm[FDDRunParams, FDDResult, typing.Iterable[float]]):
         if not self.result:
             raise ValueError("Run algorithm first")
         fig, ax = plot.CMIF_plot(
-            S_val=self.result.S_val, freq=self.result.freq, freqlim=freqlim, nSv=nSv
+            S_val=self.result.S_val,
+            freq=self.result.freq,
+            freqlim=freqlim,
+            nSv=nSv,
+            S_val_db=self.result.S_val_db,
         )
         return fig, ax
 
@@ -269,7 +305,8 @@ class EFDD(FDD[EFDDRunParams, EFDDResult, typing.Iterable[float]]):
         self.run_params.sppk = sppk
         self.run_params.npmax = npmax
 
-        # Extract modal results
+        # Extract modal results (reusing the decomposition of Sy from run)
+        self._compute_S_vec()
         Fn_FDD, Xi_FDD, Phi_FDD, forPlot = fdd.EFDD_mpe(
             self.result.Sy,
             self.result.freq,
@@ -283,6 +320,8 @@ class EFDD(FDD[EFDDRunParams, EFDDResult, typing.Iterable[float]]):
             MAClim=MAClim,
             sppk=sppk,
             npmax=npmax,
+            Sval=self.result.S_val,
+            Svec=self.result.S_vec,
         )
 
         # Save results
@@ -343,6 +382,7 @@ class EFDD(FDD[EFDDRunParams, EFDDResult, typing.Iterable[float]]):
         sel_freq = SFP.result[0]
 
         # e poi estrarre risultati
+        self._compute_S_vec()
         Fn_FDD, Xi_FDD, Phi_FDD, forPlot = fdd.EFDD_mpe(
             self.result.Sy,
             self.result.freq,
@@ -356,6 +396,8 @@ class EFDD(FDD[EFDDRunParams, EFDDResult, typing.Iterable[float]]):
             MAClim=MAClim,
             sppk=sppk,
             npmax=npmax,
+            Sval=self.result.S_val,
+            Svec=self.result.S_vec,
         )
         # Save results
         self.result.Fn = Fn_FDD.reshape(-1)
@@ -484,8 +526,13 @@ class FDD_MS(FDD[FDDRunParams, FDDResult, typing.Iterable[dict]]):
         pov = self.run_params.pov
         # self.run_params.df = 1 / dt / nxseg
 
-        freq, Sy = fdd.SD_PreGER(Y, self.fs, nxseg=nxseg, method=method, pov=pov)
-        Sval, Svec = fdd.SD_svalsvec(Sy)
+        freq, Sy = fdd.SD_PreGER(
+            Y, self.fs, nxseg=nxseg, method=method, pov=pov, dtype=self.run_params.dtype
+        )
+        if self.run_params.compute_vectors:
+            Sval, Svec = fdd.SD_svalsvec(Sy)
+        else:
+            Sval, Svec = fdd.SD_svals(Sy), None
 
         # Return results
         return self.ResultCls(
@@ -493,6 +540,7 @@ class FDD_MS(FDD[FDDRunParams, FDDResult, typing.Iterable[dict]]):
             Sy=Sy,
             S_val=Sval,
             S_vec=Svec,
+            S_val_db=fdd.SD_svals_db(Sval),
         )
 
 
@@ -545,8 +593,13 @@ class EFDD_MS(EFDD[EFDDRunParams, EFDDResult, typing.Iterable[dict]]):
         pov = self.run_params.pov
         # self.run_params.df = 1 / dt / nxseg
 
-        freq, Sy = fdd.SD_PreGER(Y, self.fs, nxseg=nxseg, method=method, pov=pov)
-        Sval, Svec = fdd.SD_svalsvec(Sy)
+        freq, Sy = fdd.SD_PreGER(
+            Y, self.fs, nxseg=nxseg, method=method, pov=pov, dtype=self.run_params.dtype
+        )
+        if self.run_params.compute_vectors:
+            Sval, Svec = fdd.SD_svalsvec(Sy)
+        else:
+            Sval, Svec = fdd.SD_svals(Sy), None
 
         # Return results
         return self.ResultCls(
@@ -554,4 +607,5 @@ class EFDD_MS(EFDD[EFDDRunParams, EFDDResult, typing.Iterable[dict]]):
             Sy=Sy,
             S_val=Sval,
             S_vec=Svec,
+            S_val_db=fdd.SD_svals_db(Sval),
         )
@@ -63,7 +63,7 @@ class pLSCF(BaseAlgorithm[pLSCFRunParams, pLSCFResult, typing.Iterable[float]]):
             An instance of `pLSCFResult` containing the analysis results, including frequencies, system
             matrices, identified poles, and their labels.
         """
-        Y = self.data.T
+        Y = self._channels_first()
         nxseg = self.run_params.nxseg
         method = self.run_params.method_SD
         pov = self.run_params.pov
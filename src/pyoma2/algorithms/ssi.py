@@ -59,7 +59,7 @@ class SSIdat(BaseAlgorithm[SSIRunParams, SSIResult, typing.Iterable[float]]):
         SSIResult
             An object containing the computed matrices and modal parameters.
         """
-        Y = self.data.T
+        Y = self._channels_first()
         br = self.run_params.br
         method_hank = self.run_params.method or self.method
         ordmin = self.run_params.ordmin
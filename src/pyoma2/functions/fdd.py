@@ -5,29 +5,84 @@ Author:
 Dag Pasca
 """
 
+import contextlib
+import functools
 import logging
 import typing
 
 import numpy as np
-from scipy import signal
-from scipy.optimize import curve_fit
-from tqdm import tqdm, trange
+from scipy import fft, signal
+from tqdm import trange
+
+# optional GPU backend for the batched SVD of the spectral matrices
+try:
+    import cupy as cp
+
+    # failures of the GPU (no device or driver, out of memory) that make the SVD
+    # fall back to numpy; any other error is raised
+    _GPU_ERRORS = (
+        cp.cuda.runtime.CUDARuntimeError,
+        cp.cuda.driver.CUDADriverError,
+        cp.cuda.memory.OutOfMemoryError,
+    )
+except ImportError:
+    cp = None
+    _GPU_ERRORS = ()
 
-from .gen import MAC
+# optional FFTW backend for the FFTs of the spectral estimates
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft
+except ImportError:
+    pyfftw = None
 
 logger = logging.getLogger(__name__)
 
+# below this size (number_of_frequencies * number_of_rows * number_of_columns**2)
+# copying the spectral matrices to the GPU costs more than the SVD itself
+GPU_SVD_MIN_SIZE = 2**26
+# whether the fall back from the GPU to numpy has already been logged
+_gpu_fallback_logged = False
+# whether the pyFFTW plan cache has already been set up by `_fft_backend`
+_fftw_cache_checked = False
+
 # =============================================================================
 # FUNZIONI FDD
 # =============================================================================
 
 
+def _fft_backend():
+    """
+    Context in which the ``scipy.fft`` transforms run on FFTW (through pyFFTW) when
+    pyFFTW is installed, and on the default pocketfft backend otherwise. The backend
+    is only switched locally, never globally.
+
+    The plan cache of the pyFFTW interfaces is a process-wide setting: it is enabled
+    here, the first time an FFT runs on pyFFTW, and only if it is not enabled already
+    (so that a configuration chosen by the user is left untouched).
+    """
+    global _fftw_cache_checked
+    if pyfftw is None:
+        return contextlib.nullcontext()
+    if not _fftw_cache_checked:
+        _fftw_cache_checked = True
+        if not pyfftw.interfaces.cache.is_enabled():
+            pyfftw.interfaces.cache.enable()
+            # keep the plans alive between interactive calls (e.g. successive EFDD mpe)
+            pyfftw.interfaces.cache.set_keepalive_time(60)
+    return fft.set_backend(pyfftw.interfaces.scipy_fft)
+
+
+# -----------------------------------------------------------------------------
+
+
 def SD_PreGER(
     Y: typing.List[typing.Dict[str, np.ndarray]],
     fs: float,
     nxseg: int = 1024,
     pov: float = 0.5,
     method: typing.Literal["per", "cor"] = "per",
+    dtype: typing.Literal["complex128", "complex64"] = "complex128",
 ):
     """
     Estimate the PSD matrix for a multi-setup experiment using either the correlogram
@@ -49,6 +104,9 @@ def SD_PreGER(
     method : str, optional
         Method for spectral density estimation. 'per' for periodogram and 'cor' for
         correlogram method. Default is 'per'.
+    dtype : str, optional
+        Complex data type of the spectral density matrices, either "complex128" or
+        "complex64" (single precision, half the memory). Default is "complex128".
 
     Returns
     -------
@@ -74,46 +132,32 @@ def SD_PreGER(
     for ii in trange(n_setup):
         logger.debug("Analyising setup nr.: %s...", ii)
 
-        Y_ref = Y[ii]["ref"]
-        Y_mov = Y[ii]["mov"]
         # Ndat =  Y[ii]["ref"].shape[1] # number of data points
         Y_all = np.vstack((Y[ii]["ref"], Y[ii]["mov"]))
         # r = Y_all.shape[0] # total sensor for the ii setup
 
-        if method == "per":
-            # noverlap = nxseg*pov
-            freq, Sy_allref = SD_est(Y_all, Y_ref, dt, nxseg, method)
-            _, Sy_allmov = SD_est(Y_all, Y_mov, dt, nxseg, method)
-            Gyy.append(np.hstack((Sy_allref, Sy_allmov)))
-
-        elif method == "cor":
-            freq, Sy_allref = SD_est(Y_all, Y_ref, dt, nxseg, method)
-            _, Sy_allmov = SD_est(Y_all, Y_mov, dt, nxseg, method)
-            Gyy.append(np.hstack((Sy_allref, Sy_allmov)))
+        # the (all, ref) and (all, mov) spectra side by side are the (all, all) one,
+        # so every channel is transformed only once
+        freq, Sy_all = SD_est(Y_all, Y_all, dt, nxseg, method, dtype=dtype)
+        Gyy.append(Sy_all)
         logger.debug("... Done with setup nr.: %s!", ii)
 
     Gy_refref = (
         1 / n_setup * np.sum([Gyy[ii][:n_ref, :n_ref] for ii in range(n_setup)], axis=0)
     )
+    # frequency lines first, to operate on all of them with stacked products
+    Gy_refref = np.moveaxis(Gy_refref, 2, 0)
 
-    Gg = []
+    Gg = [Gy_refref]
     # Scale spectrum to reference spectrum
-    for ff in range(len(freq)):
-        G1 = [
-            np.dot(
-                np.dot(
-                    Gyy[ii][n_ref:, :n_ref][:, :, ff],
-                    np.linalg.inv(Gyy[ii][:n_ref, :n_ref][:, :, ff]),
-                ),
-                Gy_refref[:, :, ff],
-            )
-            for ii in range(n_setup)
-        ]
-        G2 = np.vstack(G1)
-        G3 = np.vstack([Gy_refref[:, :, ff], G2])
-        Gg.append(G3)
+    for ii in range(n_setup):
+        G_ii = np.moveaxis(Gyy[ii], 2, 0)
+        # G_movref @ inv(G_refref) @ Gy_refref, without forming the inverse
+        Gg.append(
+            G_ii[:, n_ref:, :n_ref] @ np.linalg.solve(G_ii[:, :n_ref, :n_ref], Gy_refref)
+        )
 
-    Sy = np.array(Gg)
+    Sy = np.concatenate(Gg, axis=1)
     Sy = np.moveaxis(Sy, 0, 2)
     return freq, Sy
 
@@ -128,6 +172,7 @@ def SD_est(
     nxseg=1024,
     method="cor",
     pov=0.5,
+    dtype="complex128",
 ):
     """
     Estimate the Cross-Spectral Density (CSD) using either the correlogram method or the
@@ -148,6 +193,10 @@ def SD_est(
         periodogram. Default is "cor".
     pov : float, optional
         Proportion of overlap for the periodogram method. Default is 0.5.
+    dtype : str, optional
+        Complex data type of the estimate, either "complex128" or "complex64".
+        With "complex64" the whole estimate is computed in single precision, halving
+        its memory footprint. Default is "complex128".
 
     Returns
     -------
@@ -157,48 +206,250 @@ def SD_est(
         Sy : ndarray
             Cross-Spectral Density (CSD) estimation.
     """
-    if method == "cor":
-        Ndat = Yref.shape[1]  # number of data points
-        n_ref = Yref.shape[0]
-        n_all = Yall.shape[0]
-        # Calculating Auto e Cross-Spectral Density (Y_all, Y_ref)
-        _, Pxy = signal.csd(
-            Yall.reshape(n_all, 1, Ndat),
-            Yref.reshape(1, n_ref, Ndat),
-            nperseg=nxseg // 2,
-            nfft=nxseg,
-            noverlap=0,
-            window="boxcar",
-        )
-        Rxy = np.fft.irfft(Pxy)
+    dtype = np.dtype(dtype)
+    real_dtype = np.finfo(dtype).dtype
+    same_ref = Yref is Yall
+    Yall = np.asarray(Yall, dtype=real_dtype)
+    Yref = Yall if same_ref else np.asarray(Yref, dtype=real_dtype)
 
-        tau = -Rxy.shape[2] / np.log(0.01)
-        win = signal.windows.exponential(Rxy.shape[2], center=0, tau=tau, sym=False)
-        Rxy *= win
-        Sy = np.fft.rfft(Rxy)
+    if method == "cor":
+        # Calculating Auto e Cross-Spectral Density (Y_all, Y_ref), transforming
+        # each channel only once (with unit sampling frequency)
+        stft_kw = dict(nxseg=nxseg // 2, pov=0, window="boxcar", nfft=nxseg, dtype=dtype)
+        _, F_all, scale = SD_stft(Yall, 1.0, **stft_kw)
+        F_ref = F_all if Yref is Yall else SD_stft(Yref, 1.0, **stft_kw)[1]
+        Pxy = SD_from_stft(F_all, F_ref, scale)
+        with _fft_backend():
+            Rxy = fft.irfft(Pxy, workers=-1)
+
+            tau = -Rxy.shape[2] / np.log(0.01)
+            win = signal.windows.exponential(Rxy.shape[2], center=0, tau=tau, sym=False)
+            Rxy *= win
+            Sy = fft.rfft(Rxy, workers=-1)
         freq = np.arange(0, Sy.shape[2]) * (1 / dt / (nxseg))  # Frequency vector
 
     elif method == "per":
-        noverlap = nxseg * pov
-        Ndat = Yref.shape[1]
-        n_ref = Yref.shape[0]
-        n_all = Yall.shape[0]
         # Calculating Auto e Cross-Spectral Density (Y_all, Y_ref)
-        freq, Sy = signal.csd(
-            Yall.reshape(n_all, 1, Ndat),
-            Yref.reshape(1, n_ref, Ndat),
-            fs=1 / dt,
-            nperseg=nxseg,
-            noverlap=noverlap,
-            window="hann",
+        freq, F_all, scale = SD_stft(Yall, dt, nxseg=nxseg, pov=pov, dtype=dtype)
+        F_ref = (
+            F_all
+            if Yref is Yall
+            else SD_stft(Yref, dt, nxseg=nxseg, pov=pov, dtype=dtype)[1]
         )
-    return freq, Sy
+        Sy = SD_from_stft(F_all, F_ref, scale)
+    return freq, Sy.astype(dtype, copy=False)
 
 
 # -----------------------------------------------------------------------------
 
 
-def SD_svalsvec(SD):
+def SD_stft(Y, dt, nxseg=1024, pov=0.5, window="hann", nfft=None, dtype="complex128"):
+    """
+    Compute the spectra of the windowed (overlapping) segments of each channel, from
+    which the periodogram estimate of the Cross-Spectral Density (CSD) is built.
+
+    Parameters
+    ----------
+    Y : ndarray
+        Input signal data, with shape (number_of_channels, number_of_samples).
+    dt : float
+        Sampling interval.
+    nxseg : int, optional
+        Length of each segment. Default is 1024.
+    pov : float, optional
+        Proportion of overlap between the segments. Default is 0.5.
+    window : str, optional
+        Window applied to each segment. Default is "hann".
+    nfft : int, optional
+        Length of the FFT (zero padding the segments). Default is None (`nxseg`).
+    dtype : str, optional
+        Complex data type of the spectra, either "complex128" or "complex64".
+        Default is "complex128".
+
+    Returns
+    -------
+    tuple
+        freq : ndarray
+            Array of frequencies.
+        F : ndarray
+            Spectra of the segments, with shape
+            (number_of_channels, number_of_segments, number_of_frequencies).
+        scale : ndarray
+            Scaling factor of each frequency line, so that the CSD (with the same
+            density scaling as ``scipy.signal.csd``) between the channels i and j at the
+            frequency line k is ``scale[k] * sum(conj(F[i, :, k]) * F[j, :, k])``.
+    """
+    Y = np.asarray(Y, dtype=np.finfo(np.dtype(dtype)).dtype)
+    fs = 1 / dt
+    nperseg = nxseg
+    Ndat = Y.shape[1]
+    if nperseg > Ndat:
+        logger.warning(
+            "nperseg = %s is greater than input length = %s, using nperseg = %s",
+            nperseg,
+            Ndat,
+            Ndat,
+        )
+        nperseg = Ndat
+    if nfft is None:
+        nfft = nperseg
+    noverlap = int(nxseg * pov)
+    if noverlap >= nperseg:
+        raise ValueError("noverlap must be less than nperseg.")
+    step = nperseg - noverlap
+    win, win_pow = _window(window, nperseg, Y.dtype.name)
+
+    # Split each channel into segments, remove the mean of each segment and window it
+    # (copied once to a contiguous buffer, then demeaned and windowed in place)
+    segs = np.lib.stride_tricks.sliding_window_view(Y, nperseg, axis=-1)[:, ::step]
+    segs = np.array(segs)
+    segs -= segs.mean(axis=-1, keepdims=True)
+    segs *= win
+    # the segments are transformed in parallel (pocketfft's or FFTW's threads)
+    with _fft_backend():
+        F = fft.rfft(segs, n=nfft, axis=-1, workers=-1)
+
+    # Density scaling averaged over the segments, doubling everything but the DC
+    # (and Nyquist) terms for the one-sided spectrum
+    nseg = F.shape[1]
+    scale = np.full(F.shape[2], 1.0 / (fs * win_pow * nseg))
+    if nfft % 2:
+        scale[1:] *= 2
+    else:
+        scale[1:-1] *= 2
+    freq = fft.rfftfreq(nfft, dt)
+    return freq, F, scale
+
+
+# -----------------------------------------------------------------------------
+
+
+@functools.lru_cache(maxsize=8)
+def _window(window, nperseg, dtype="float64"):
+    """
+    Window of length `nperseg`, in the (real) working precision `dtype`, and its power
+    ``sum(win**2)``, cached so that repeated estimates with the same segment length
+    (e.g. the setups of a multi-setup) build them only once. The window is returned
+    read-only, as it is shared between calls.
+    """
+    win = signal.get_window(window, nperseg)
+    # the power is always computed in double precision
+    win_pow = float(np.dot(win, win))
+    win = win.astype(dtype, copy=False)
+    win.flags.writeable = False
+    return win, win_pow
+
+
+# -----------------------------------------------------------------------------
+
+
+def SD_from_stft(F_all, F_ref, scale):
+    """
+    Assemble the Cross-Spectral Density (CSD) matrix from the segment spectra returned
+    by ``SD_stft``.
+
+    Each channel is transformed only once and, for each frequency line, the average
+    over the segments is computed as a single matrix product, instead of computing
+    one FFT for every pair of channels.
+
+    Parameters
+    ----------
+    F_all : ndarray
+        Spectra of the segments of all the channels, as returned by ``SD_stft``.
+    F_ref : ndarray
+        Spectra of the segments of the reference channels, as returned by ``SD_stft``.
+    scale : ndarray
+        Scaling factor of each frequency line, as returned by ``SD_stft``.
+
+    Returns
+    -------
+    Sy : ndarray
+        Cross-Spectral Density (CSD) matrix, with shape
+        (number_of_channels, number_of_references, number_of_frequencies).
+    """
+    # conj(F_all) @ F_ref.T for every frequency line
+    Sy = np.matmul(F_all.conj().transpose(2, 0, 1), F_ref.transpose(2, 1, 0))
+    Sy = Sy.transpose(1, 2, 0)
+    Sy *= scale.astype(Sy.real.dtype)
+    return Sy
+
+
+# -----------------------------------------------------------------------------
+
+
+def _is_hermitian(SD, rtol=None):
+    """
+    Check whether every frequency line of a stack of CSD matrices is Hermitian,
+    within a tolerance relative to the largest entry of each line (by default the
+    square root of the machine precision of the data type).
+    """
+    nr, nc, nf = SD.shape
+    if nr != nc:
+        return False
+    if rtol is None:
+        rtol = np.sqrt(np.finfo(SD.dtype).eps)
+    dev = np.abs(SD - SD.conj().transpose(1, 0, 2)).max(axis=(0, 1))
+    return bool(np.all(dev <= rtol * np.abs(SD).max(axis=(0, 1))))
+
+
+def _svd_stack(SD, compute_uv=True, hermitian=None):
+    """
+    Decompose all the frequency lines of a stack of CSD matrices with a single
+    (stacked) call, returning the left singular vectors (if requested) and the
+    singular values in descending order. If `hermitian` is None, whether the
+    Hermitian solver can be used is checked on the data.
+    """
+    global _gpu_fallback_logged
+    SD_b = np.moveaxis(SD, 2, 0)
+    nf, nr, nc = SD_b.shape
+    # The CSD matrix is Hermitian (positive semidefinite) when built from the
+    # same channels, so an eigendecomposition gives the SVD at a lower cost
+    if hermitian is None:
+        hermitian = _is_hermitian(SD)
+    if cp is not None and nf * nr * nc**2 > GPU_SVD_MIN_SIZE:
+        try:
+            return _svd_stack_gpu(SD_b, compute_uv=compute_uv, hermitian=hermitian)
+        except _GPU_ERRORS as e:
+            if not _gpu_fallback_logged:
+                logger.warning("GPU SVD failed, falling back to numpy: %s", e)
+                _gpu_fallback_logged = True
+    # Only the leading singular vectors are ever used, so the economy SVD is enough
+    if not compute_uv:
+        return np.linalg.svd(
+            SD_b, full_matrices=False, compute_uv=False, hermitian=hermitian
+        )
+    U, S, _ = np.linalg.svd(SD_b, full_matrices=False, hermitian=hermitian)
+    return U, S
+
+
+def _svd_stack_gpu(SD_b, compute_uv=True, hermitian=False):
+    """
+    Same as ``_svd_stack`` on a stack of matrices with the frequency lines first,
+    computed on the GPU with CuPy. Hermitian matrices are decomposed with the
+    eigensolver as ``numpy.linalg.svd(..., hermitian=True)`` does, so that the
+    singular vectors follow the same phase convention on both backends.
+    """
+    SD_d = cp.asarray(SD_b)
+    if hermitian:
+        if not compute_uv:
+            S = cp.abs(cp.linalg.eigvalsh(SD_d))
+            return cp.sort(S, axis=-1)[..., ::-1].get()
+        w, U = cp.linalg.eigh(SD_d)
+        S = cp.abs(w)
+        order = cp.argsort(S, axis=-1)[..., ::-1]
+        S = cp.take_along_axis(S, order, axis=-1)
+        U = cp.take_along_axis(U, order[..., None, :], axis=-1)
+        return U.get(), S.get()
+    if not compute_uv:
+        return cp.linalg.svd(SD_d, full_matrices=False, compute_uv=False).get()
+    U, S, _ = cp.linalg.svd(SD_d, full_matrices=False)
+    return U.get(), S.get()
+
+
+# -----------------------------------------------------------------------------
+
+
+def SD_svalsvec(SD, hermitian=None):
     """
     Compute the singular values and singular vectors for a given set of Cross-Spectral
     Density (CSD) matrices.
@@ -208,25 +459,38 @@ def SD_svalsvec(SD):
     SD : ndarray
         Array of Cross-Spectral Density (CSD) matrices, with shape
         (number_of_rows, number_of_columns, number_of_frequencies).
+    hermitian : bool, optional
+        Whether the CSD matrices are Hermitian, so that the Hermitian eigensolver can
+        be used. If None (default) this is checked on the data; pass it explicitly to
+        skip the check when it is known in advance.
 
     Returns
     -------
     tuple
         S_val : ndarray
-            Singular values.
+            Singular values, stored as diagonal matrices with shape
+            (number_of_columns, number_of_columns, number_of_frequencies).
         S_vec : ndarray
-            Singular vectors.
+            Left singular vectors (conjugate transposed, one per row), with shape
+            (min(number_of_rows, number_of_columns), number_of_rows,
+            number_of_frequencies). For the rectangular spectra of a multi-setup
+            (PreGER) analysis only the singular vectors of the reference channels are
+            returned, i.e. the first axis has n_ref instead of number_of_rows entries.
+
+    Note
+    -----
+    ``numpy.linalg.svd`` always dispatches to the divide-and-conquer LAPACK driver
+    (``?gesdd``), does not scan the input for non-finite values and, unlike
+    ``scipy.linalg.svd``, accepts a stack of matrices. When the CSD matrices are
+    Hermitian (e.g. from the "per" method) the cheaper Hermitian eigensolver is
+    used instead. If CuPy is installed and the problem is large enough (see
+    ``GPU_SVD_MIN_SIZE``) the decomposition runs on the GPU.
     """
     nr, nc, nf = SD.shape
-    Sval = np.zeros((nf, nc))
-    S_val = np.empty((nf, nc, nc))
-    S_vec = np.empty((nf, nr, nr), dtype=complex)
-    for k in range(nf):
-        U1, S, _ = np.linalg.svd(SD[:, :, k])
-        U1_1 = U1.conj().T
-        Sval[k, :] = np.sqrt(S)
-        S_val[k, :, :] = np.diag(np.sqrt(S))
-        S_vec[k, :, :] = U1_1
+    U1, S = _svd_stack(SD, compute_uv=True, hermitian=hermitian)
+    S_val = np.zeros((nf, nc, nc))
+    S_val[:, range(nc), range(nc)] = np.sqrt(S[:, :nc])
+    S_vec = U1.conj().transpose(0, 2, 1)
     S_val = np.moveaxis(S_val, 0, 2)
     S_vec = np.moveaxis(S_vec, 0, 2)
     return S_val, S_vec
@@ -235,13 +499,111 @@ def SD_svalsvec(SD):
 # -----------------------------------------------------------------------------
 
 
+def SD_svals(SD, hermitian=None):
+    """
+    Compute only the singular values for a given set of Cross-Spectral Density (CSD)
+    matrices, skipping the (more expensive) computation of the singular vectors.
+
+    Parameters
+    ----------
+    SD : ndarray
+        Array of Cross-Spectral Density (CSD) matrices, with shape
+        (number_of_rows, number_of_columns, number_of_frequencies).
+    hermitian : bool, optional
+        Whether the CSD matrices are Hermitian, see ``SD_svalsvec``. If None (default)
+        this is checked on the data.
+
+    Returns
+    -------
+    S_val : ndarray
+        Singular values, stored as diagonal matrices with shape
+        (number_of_columns, number_of_columns, number_of_frequencies), as returned
+        by ``SD_svalsvec``.
+    """
+    nr, nc, nf = SD.shape
+    S = _svd_stack(SD, compute_uv=False, hermitian=hermitian)
+    S_val = np.zeros((nf, nc, nc))
+    S_val[:, range(nc), range(nc)] = np.sqrt(S[:, :nc])
+    S_val = np.moveaxis(S_val, 0, 2)
+    return S_val
+
+
+# -----------------------------------------------------------------------------
+
+
+def SD_svals_from_stft(F, scale):
+    """
+    Compute the singular values of the Cross-Spectral Density (CSD) matrices directly
+    from the segment spectra returned by ``SD_stft``, without building the CSD matrix.
+
+    Since the CSD matrix at each frequency line is (proportional to) the product of
+    the segment spectra with their conjugate transpose, its singular values are the
+    squared singular values of the (number_of_channels, number_of_segments) matrix
+    of the segment spectra. This is cheaper whenever there are fewer segments than
+    channels.
+
+    Parameters
+    ----------
+    F : ndarray
+        Spectra of the segments, as returned by ``SD_stft``.
+    scale : ndarray
+        Scaling factor of each frequency line, as returned by ``SD_stft``.
+
+    Returns
+    -------
+    S_val : ndarray
+        Singular values, stored as diagonal matrices with shape
+        (number_of_channels, number_of_channels, number_of_frequencies), as returned
+        by ``SD_svalsvec``.
+    """
+    nch, nseg, nf = F.shape
+    S = np.linalg.svd(F.transpose(2, 0, 1), compute_uv=False)
+    k = S.shape[1]
+    S_val = np.zeros((nf, nch, nch))
+    # sqrt of the singular values of the CSD matrix (as in SD_svalsvec)
+    S_val[:, range(k), range(k)] = S * np.sqrt(scale)[:, None]
+    S_val = np.moveaxis(S_val, 0, 2)
+    return S_val
+
+
+# -----------------------------------------------------------------------------
+
+
+def SD_svals_db(S_val):
+    """
+    Convert the singular values of the Cross-Spectral Density (CSD) matrix to decibels,
+    as plotted by the Complex Mode Indicator Function (CMIF).
+
+    Parameters
+    ----------
+    S_val : ndarray
+        Singular values, as returned by ``SD_svalsvec`` or ``SD_svals``, with shape
+        (number_of_channels, number_of_channels, number_of_frequencies).
+
+    Returns
+    -------
+    S_val_db : ndarray
+        Singular values in decibels (``10*log10``), with shape
+        (number_of_channels, number_of_frequencies). Stored in single precision, as
+        it is only meant for plotting.
+    """
+    S_diag = np.diagonal(S_val, axis1=0, axis2=1).T
+    # null singular values (rank deficient CSD) go to -inf
+    with np.errstate(divide="ignore"):
+        S_val_db = (10 * np.log10(S_diag)).astype(np.float32)
+    return S_val_db
+
+
+# -----------------------------------------------------------------------------
+
+
 def FDD_mpe(
     Sval,
     Svec,
     freq,
     sel_freq,
     DF=0.1,
-    ):
+):
     """
     Extracts modal parameters using the Frequency Domain Decomposition (FDD) method.
 
@@ -276,52 +638,52 @@ def FDD_mpe(
     """
     # Sval, Svec = SD_svalsvec(Sy)
     Nch, Nref, Nf = Sval.shape
-
-    Freq = []
-    Fi = []
-    index = []
-    maxSy_diff = []
+    sel_freq = np.asarray(sel_freq, dtype=float)
     logger.info("Extracting FDD modal parameters")
-    if Nref == 1:
+    if Nref == 1:  # peak serching is not available for single ref. ch.
         logging.warning("Only 1 reference channel is used - Peak-searching is disabled")
-    for sel_fn in tqdm(sel_freq):
-        if Nref > 1:    # peak serching is not available for single ref. ch.
-            # Frequency bandwidth where the peak is searched
-            lim = (sel_fn - DF, sel_fn + DF)
-            idxlim = (
-                np.argmin(np.abs(freq - lim[0])),
-                np.argmin(np.abs(freq - lim[1])),
-            )  # Indices of the limits
-            # Ratios between the first and second singular value
-            diffS1S2 = Sval[0, 0, idxlim[0] : idxlim[1]] / Sval[1, 1, idxlim[0] : idxlim[1]]
-            maxDiffS1S2 = np.max(diffS1S2)  # Looking for the maximum difference
-            idx1 = np.argmin(np.abs(diffS1S2 - maxDiffS1S2))  # Index of the max diff
-            idxfin = idxlim[0] + idx1  # Final index
-            maxSy_diff.append(maxDiffS1S2)
-        else:
-            idxfin = np.argmin(np.abs(freq - sel_fn))
-        # Modal properties
-        fn_FDD = freq[idxfin]  # Frequency
-        phi_FDD = Svec[0, :, idxfin]  # Mode shape
-        # Normalized (unity displacement)
-        phi_FDDn = phi_FDD / phi_FDD[np.argmax(np.abs(phi_FDD))]
-
-        Freq.append(fn_FDD)
-        Fi.append(phi_FDDn)
-        index.append(idxfin)
+        # index of the closest frequency line
+        idxfin = np.argmin(np.abs(freq[np.newaxis, :] - sel_freq[:, np.newaxis]), axis=1)
+    else:
+        # Frequency bandwidths where the peaks are searched
+        lims = np.stack((sel_freq - DF, sel_freq + DF), axis=1)
+        # Indices of the limits
+        idxlim = np.argmin(np.abs(freq - lims[..., np.newaxis]), axis=2)
+        # Ratios between the first and second singular value
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diffS1S2 = Sval[0, 0, :] / Sval[1, 1, :]
+        idxfin = np.zeros(len(sel_freq), dtype=int)
+        for ii, (lo, hi) in enumerate(idxlim):
+            # windows have different lengths, only the search is left in the loop
+            diff = diffS1S2[lo:hi]
+            maxDiffS1S2 = np.max(diff)  # Looking for the maximum difference
+            # Final index (of the max diff)
+            idxfin[ii] = lo + np.argmin(np.abs(diff - maxDiffS1S2))
     logger.debug("Done!")
 
-    Fn = np.array(Freq)
-    Phi = np.array(Fi).T
-    index = np.array(index)
+    # Modal properties
+    Fn = freq[idxfin]  # Frequencies
+    Phi = Svec[0][:, idxfin]  # Mode shapes
+    # Normalized (unity displacement)
+    Phi = Phi / Phi[np.argmax(np.abs(Phi), axis=0), np.arange(Phi.shape[1])]
     return Fn, Phi
 
 
-
 # -----------------------------------------------------------------------------
 # COMMENT
 # Utility function (Hidden for users?)
-def SDOF_bellandMS(Sy, dt, sel_fn, phi_FDD, method="FSDD", cm=1, MAClim=0.85, DF=1.0):
+def SDOF_bellandMS(
+    Sy,
+    dt,
+    sel_fn,
+    phi_FDD,
+    method="FSDD",
+    cm=1,
+    MAClim=0.85,
+    DF=1.0,
+    Sval=None,
+    Svec=None,
+):
     """
     Computes the SDOF bell and mode shapes for a specified frequency range using FSDD or
     EFDD methods.
@@ -341,11 +703,19 @@ def SDOF_bellandMS(Sy, dt, sel_fn, phi_FDD, method="FSDD", cm=1, MAClim=0.85, DF
         Method for SDOF analysis. Supports 'FSDD' for Frequency Spatial Domain Decomposition
         and 'EFDD' for Enhanced Frequency Domain Decomposition. Default is 'FSDD'.
     cm : int, optional
-        Number of close modes to consider in the analysis. Default is 1.
+        Number of close modes to consider in the analysis. Default is 1. It cannot
+        exceed the number of singular vectors, i.e. the number of reference channels
+        for a rectangular `Sy`.
     MAClim : float, optional
         Threshold for the Modal Assurance Criterion (MAC) to filter modes. Default is 0.85.
     DF : float, optional
         Frequency bandwidth around the selected frequency for analysis. Default is 1.0.
+    Sval : ndarray, optional
+        Singular values of `Sy`, as returned by ``SD_svalsvec``. If None (default) they
+        are computed here together with `Svec`.
+    Svec : ndarray, optional
+        Singular vectors of `Sy`, as returned by ``SD_svalsvec``. If None (default) they
+        are computed here together with `Sval`.
 
     Returns
     -------
@@ -354,9 +724,20 @@ def SDOF_bellandMS(Sy, dt, sel_fn, phi_FDD, method="FSDD", cm=1, MAClim=0.85, DF
             The SDOF bell (power spectral density) of the selected mode.
         SDOFms1 : ndarray
             The mode shapes corresponding to the SDOF bell.
+
+    Raises
+    ------
+    ValueError
+        If `cm` is larger than the number of singular vectors of `Sy`.
     """
 
-    Sval, Svec = SD_svalsvec(Sy)
+    if Sval is None or Svec is None:
+        Sval, Svec = SD_svalsvec(Sy)
+    if cm > Svec.shape[0]:
+        raise ValueError(
+            f"cm ({cm}) cannot exceed the number of singular vectors of the spectral "
+            f"matrix ({Svec.shape[0]}, the number of reference channels)"
+        )
     Nch = phi_FDD.shape[0]
     nxseg = Sval.shape[2]
     freq = np.arange(0, nxseg) * (1 / dt / (2 * nxseg))
@@ -370,44 +751,29 @@ def SDOF_bellandMS(Sy, dt, sel_fn, phi_FDD, method="FSDD", cm=1, MAClim=0.85, DF
     SDOFbell = np.zeros(len(np.arange(idxlim[0], idxlim[1])), dtype=complex)
     SDOFms = np.zeros((len(np.arange(idxlim[0], idxlim[1])), Nch), dtype=complex)
 
+    sl = slice(int(idxlim[0]), int(idxlim[1]))
+    # squared norm of the reference mode shape (for the MAC)
+    phi_norm = np.real(np.vdot(phi_FDD, phi_FDD))
     for csm in range(cm):  # Loop through close mode (if any, default 1)
+        # singular vectors of all the lines in the band, shape (Nch, nlines)
+        vecs = Svec[csm, :, sl]
+        # MAC between the reference and each singular vector (MAC > MAClim)
+        mac = np.abs(phi_FDD.conj() @ vecs) ** 2 / (
+            phi_norm * np.sum(np.abs(vecs) ** 2, axis=0)
+        )
+        mask = mac > MAClim
         # Frequency Spatial Domain Decomposition variation (defaulf)
         if method == "FSDD":
-            # Save values that satisfy MAC > MAClim condition
-            SDOFbell += np.array(
-                [
-                    np.dot(
-                        np.dot(phi_FDD.conj().T, Sy[:, :, el]), phi_FDD
-                    )  # Enhanced PSD matrix (frequency filtered)
-                    if MAC(phi_FDD, Svec[csm, :, el]) > MAClim
-                    else 0
-                    for el in range(int(idxlim[0]), int(idxlim[1]))
-                ]
-            )
-            # Do the same for mode shapes
-            SDOFms += np.array(
-                [
-                    Svec[csm, :, el]
-                    if MAC(phi_FDD, Svec[csm, :, el]) > MAClim
-                    else np.zeros(Nch)
-                    for el in range(int(idxlim[0]), int(idxlim[1]))
-                ]
-            )
+            # Enhanced PSD matrix (frequency filtered)
+            bell = np.einsum("i,ijk,j->k", phi_FDD.conj(), Sy[:, :, sl], phi_FDD)
         elif method == "EFDD":
-            SDOFbell += np.array(
-                [
-                    Sval[csm, csm, l_] if MAC(phi_FDD, Svec[csm, :, l_]) > MAClim else 0
-                    for l_ in range(int(idxlim[0]), int(idxlim[1]))
-                ]
-            )
-            SDOFms += np.array(
-                [
-                    Svec[csm, :, l_]
-                    if MAC(phi_FDD, Svec[csm, :, l_]) > MAClim
-                    else np.zeros(Nch)
-                    for l_ in range(int(idxlim[0]), int(idxlim[1]))
-                ]
-            )
+            bell = Sval[csm, csm, sl]
+        else:
+            continue
+        # Save values that satisfy MAC > MAClim condition
+        SDOFbell += np.where(mask, bell, 0)
+        # Do the same for mode shapes
+        SDOFms += np.where(mask[:, np.newaxis], vecs.T, 0)
 
     SDOFbell1 = np.zeros((nxseg), dtype=complex)
     SDOFms1 = np.zeros((nxseg, Nch), dtype=complex)
@@ -432,6 +798,8 @@ def EFDD_mpe(
     MAClim: float = 0.85,
     sppk: int = 3,
     npmax: int = 20,
+    Sval: typing.Optional[np.ndarray] = None,
+    Svec: typing.Optional[np.ndarray] = None,
 ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, typing.List]:
     """
     Extracts modal parameters using the Enhanced Frequency Domain Decomposition (EFDD) and
@@ -466,6 +834,12 @@ def EFDD_mpe(
     npmax : int, optional
         Maximum number of peaks to consider in the curve fitting for damping ratio
         estimation. Default is 20.
+    Sval : ndarray, optional
+        Singular values of `Sy`, as returned by ``SD_svalsvec``. If None (default) they
+        are computed here together with `Svec`.
+    Svec : ndarray, optional
+        Singular vectors of `Sy`, as returned by ``SD_svalsvec``. If None (default) they
+        are computed here together with `Sval`.
 
     Returns
     -------
@@ -481,7 +855,8 @@ def EFDD_mpe(
             SDOF bell, singular values, indices of singular values, normalized
             autocorrelation, indices of peaks, damping ratio fit parameters, and delta values.
     """
-    Sval, Svec = SD_svalsvec(Sy)
+    if Sval is None or Svec is None:
+        Sval, Svec = SD_svalsvec(Sy)
 
     Nch, Nref, nxseg = Sval.shape
     # number of points for the inverse transform (zeropadding)
@@ -495,17 +870,36 @@ def EFDD_mpe(
     Xi_E = []
 
     logger.info("Extracting EFDD modal parameters")
+    # The decomposition of Sy is the same for every mode, reuse it
+    SDOFbells = np.array(
+        [
+            SDOF_bellandMS(
+                Sy,
+                dt,
+                sel_freq[n],
+                Phi_FDD[:, n],
+                method=method,
+                cm=cm,
+                MAClim=MAClim,
+                DF=DF2,
+                Sval=Sval,
+                Svec=Svec,
+            )[0]
+            for n in range(len(sel_freq))
+        ]
+    ).reshape(len(sel_freq), nxseg)
+    # Autocorrelation functions (Free Decay) of all the SDOF bells at once
+    with _fft_backend():
+        SDOFcorr = fft.ifft(SDOFbells, n=nIFFT, axis=-1, norm="ortho", workers=-1).real
+
     for n in trange(len(sel_freq)):  # looping through all frequencies to estimate
         phi_FDD = Phi_FDD[:, n]  # Select reference mode shape (from FDD)
-        sel_fn = sel_freq[n]
-        SDOFbell, SDOFms = SDOF_bellandMS(
-            Sy, dt, sel_fn, phi_FDD, method=method, cm=cm, MAClim=MAClim, DF=DF2
-        )
+        SDOFbell = SDOFbells[n]
 
         # indices of the singular values in SDOFsval
         idSV = np.array(np.where(SDOFbell)).T
         # Autocorrelation function (Free Decay)
-        SDOFcorr1 = np.fft.ifft(SDOFbell, n=nIFFT, axis=0, norm="ortho").real
+        SDOFcorr1 = SDOFcorr[n]
         df = 1 / dt / nxseg
         tlag = 1 / df  # time lag
         time = np.linspace(0, tlag, len(SDOFcorr1) // 2)  # t
@@ -520,31 +914,31 @@ def EFDD_mpe(
         zc1 = np.where(sgn1)[0]  # Zero crossing indices
 
         # finding maximums and minimums (peaks) of the autoccorelation
-        maxSDOFcorr = [
-            np.max(normSDOFcorr[zc1[_i] : zc1[_i + 2]])
-            for _i in range(0, len(zc1) - 2, 2)
-        ]
-        minSDOFcorr = [
-            np.min(normSDOFcorr[zc1[_i] : zc1[_i + 2]])
-            for _i in range(0, len(zc1) - 2, 2)
-        ]
-        if len(maxSDOFcorr) > len(minSDOFcorr):
+        # (one per half cycle, between every other zero crossing)
+        starts = zc1[0 : len(zc1) - 2 : 2]
+        if len(starts) > 0:
+            segs = normSDOFcorr[: zc1[len(starts) * 2]]
+            maxSDOFcorr = np.maximum.reduceat(segs, starts)
+            minSDOFcorr = np.minimum.reduceat(segs, starts)
+        else:
+            maxSDOFcorr = minSDOFcorr = np.array([])
+        npk = len(maxSDOFcorr)
+        if npk > len(minSDOFcorr):
             maxSDOFcorr = maxSDOFcorr[:-1]
-        elif len(maxSDOFcorr) < len(minSDOFcorr):
+        elif npk < len(minSDOFcorr):
             minSDOFcorr = minSDOFcorr[:-1]
 
         minmax = np.array((minSDOFcorr, maxSDOFcorr))
         minmax = np.ravel(minmax, order="F")
 
-        # finding the indices of the peaks
-        maxSDOFcorr_idx = [np.argmin(abs(normSDOFcorr - maxx)) for maxx in maxSDOFcorr]
-        minSDOFcorr_idx = [np.argmin(abs(normSDOFcorr - minn)) for minn in minSDOFcorr]
-        minmax_idx = np.array((minSDOFcorr_idx, maxSDOFcorr_idx))
-        minmax_idx = np.ravel(minmax_idx, order="F")
+        # finding the indices of the peaks (first sample holding each peak value)
+        vals, first = np.unique(normSDOFcorr, return_index=True)
+        minmax_idx = first[np.searchsorted(vals, minmax)]
 
         # Peacks and indices of the peaks to be used in the fitting
-        minmax_fit = np.array([minmax[_a] for _a in range(sppk, sppk + npmax)])
-        minmax_fit_idx = np.array([minmax_idx[_a] for _a in range(sppk, sppk + npmax)])
+        fit = np.arange(sppk, sppk + npmax)
+        minmax_fit = minmax[fit]
+        minmax_fit_idx = minmax_idx[fit]
 
         # estimating the natural frequency from the distance between the peaks
         # *2 because we use both max and min
@@ -554,18 +948,11 @@ def EFDD_mpe(
         fd_EFDD = 1 / Td_EFDD  # damped natural frequency
 
         # Log decrement
-        delta = np.array(
-            [
-                1 * np.log(np.abs(minmax[0]) / np.abs(minmax[ii]))
-                for ii in range(len(minmax_fit))
-            ]
-        )
-
-        # Fit
-        def _fit(x, m):
-            return m * x
+        delta = np.log(np.abs(minmax[0]) / np.abs(minmax[: len(minmax_fit)]))
 
-        lam, _ = curve_fit(_fit, np.arange(len(minmax_fit)), delta)
+        # Fit (least squares line through the origin)
+        x = np.arange(len(minmax_fit))
+        lam = np.array([x @ delta / (x @ x)])
 
         # damping ratio
         if methodSy == "cor":  # correct for exponential window
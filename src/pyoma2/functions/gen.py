@@ -283,29 +283,88 @@ def SC_apply(Fn, Xi, Phi, ordmin, ordmax, step, err_fn, err_xi, err_phi) -> np.n
         if o == 0:
             continue
 
-        for i in range(len(f_n)):
-            try:
-                idx = np.nanargmin(np.abs(f_n1 - f_n[i]))
-
-                cond1 = np.abs(f_n[i] - f_n1[idx]) / f_n[i]
-                cond2 = np.abs(xi_n[i] - xi_n1[idx]) / xi_n[i]
-                cond3 = 1 - MAC(phi_n[i, :], phi_n1[idx, :])
-                if cond1 < err_fn and cond2 < err_xi and cond3 < err_phi:
-                    Lab[i, o] = 1  # Stable
-                else:
-                    Lab[i, o] = 0  # Nuovo polo o polo instabile
-            except Exception as e:
-                # If f_n[i] is nan, do nothin, n.b. the lab stays 0
-                logger.debug(e)
+        # all the poles of the order at once: closest pole of the previous order
+        dist = np.abs(f_n1.T - f_n)
+        nan_dist = np.isnan(dist)
+        # If f_n[i] is nan (or the previous order has no poles) the lab stays 0
+        valid = ~np.all(nan_dist, axis=1)
+        idx = np.argmin(np.where(nan_dist, np.inf, dist), axis=1)
+
+        phi_n1 = phi_n1[idx, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cond1 = np.abs(f_n[:, 0] - f_n1[idx, 0]) / f_n[:, 0]
+            cond2 = np.abs(xi_n[:, 0] - xi_n1[idx, 0]) / xi_n[:, 0]
+            # MAC between each pole and its closest one
+            cond3 = 1 - np.abs(np.sum(np.conj(phi_n) * phi_n1, axis=1)) ** 2 / (
+                np.sum(np.abs(phi_n) ** 2, axis=1) * np.sum(np.abs(phi_n1) ** 2, axis=1)
+            )
+        # Stable (1) or Nuovo polo o polo instabile (0)
+        Lab[:, o] = valid & (cond1 < err_fn) & (cond2 < err_xi) & (cond3 < err_phi)
     return Lab
 
 
 # -----------------------------------------------------------------------------
 
 
-def dfphi_map_func(phi, sens_names, sens_map, cstrn=None) -> pd.DataFrame:
+def dfphi_map_index(
+    sens_names, sens_map, cstrn=None
+) -> typing.Tuple[np.ndarray, np.ndarray]:
     """
-    Maps mode shapes to sensor locations and constraints, creating a dataframe.
+    Computes the indices that map the mode shapes to the sensor locations.
+
+    The mapping only depends on the geometry, so it can be computed once and passed
+    to ``dfphi_map_func`` for every mode shape.
+
+    Parameters
+    ----------
+    sens_names : list
+        List of sensor names corresponding to the mode shapes.
+    sens_map : pd.DataFrame
+        DataFrame containing the sensor mappings.
+    cstrn : pd.DataFrame, optional
+        DataFrame containing constraints, by default None.
+
+    Returns
+    -------
+    tuple
+        idx : np.ndarray
+            Array with the shape of ``sens_map`` holding, for each cell, the index of
+            the mapped value among the sensors followed by the constraints, or -1 for
+            cells not matching any name.
+        fill : np.ndarray
+            Array with the shape of ``sens_map`` holding the (numerical) value of the
+            cells not matching any name, and zeros elsewhere.
+    """
+    # names that can be mapped (sensors first, then constraints)
+    names = list(sens_names)
+    if cstrn is not None:
+        names += list(cstrn.index)
+    # position of each name (on duplicates the last one wins, as constraints did)
+    pos = {name: ii for ii, name in enumerate(names)}
+    lookup = pd.Index(list(pos))
+    pos = np.fromiter(pos.values(), dtype=int, count=len(pos))
+
+    cells = sens_map.to_numpy().ravel()
+    idx = lookup.get_indexer(cells)
+    mapped = idx >= 0
+    idx[mapped] = pos[idx[mapped]]
+    # cells not matching any name (e.g. zeros) keep their (numerical) value
+    fill = np.zeros(cells.shape)
+    fill[~mapped] = cells[~mapped].astype(float)
+    return idx.reshape(sens_map.shape), fill.reshape(sens_map.shape)
+
+
+# -----------------------------------------------------------------------------
+
+
+def dfphi_map_array(
+    phi, sens_names, sens_map, cstrn=None, map_idx=None, out=None
+) -> np.ndarray:
+    """
+    Maps mode shapes to sensor locations and constraints, returning a plain array.
+
+    Same as ``dfphi_map_func`` without building the DataFrame, for callers that only
+    need the values.
 
     Parameters
     ----------
@@ -317,36 +376,70 @@ def dfphi_map_func(phi, sens_names, sens_map, cstrn=None) -> pd.DataFrame:
         DataFrame containing the sensor mappings.
     cstrn : pd.DataFrame, optional
         DataFrame containing constraints, by default None.
+    map_idx : tuple, optional
+        Mapping indices as returned by ``dfphi_map_index``. If None (default) they
+        are computed from ``sens_names``, ``sens_map`` and ``cstrn``.
+    out : np.ndarray, optional
+        Array with the shape of ``sens_map`` the result is written to, e.g. to reuse
+        the same buffer for several mode shapes. By default a new array is allocated.
 
     Returns
     -------
-    pd.DataFrame
-        DataFrame with mode shapes mapped to sensor points.
+    np.ndarray
+        Array with the shape of ``sens_map`` with mode shapes mapped to sensor points
+        (``out`` if given).
     """
-    # create mode shape dataframe
-    df_phi = pd.DataFrame(
-        {"sName": sens_names, "Phi": phi},
-    )
-
+    if map_idx is None:
+        map_idx = dfphi_map_index(sens_names, sens_map, cstrn=cstrn)
+    idx, fill = map_idx
+    # values that can be mapped (sensors first, then constraints)
+    values = [np.asarray(phi)]
     # APPLY POINTS TO SENSOR MAPPING
     # check for costraints
     if cstrn is not None:
         cstr = cstrn.to_numpy(na_value=0)[:, :]
-        val = cstr @ phi
-        ctn_df = pd.DataFrame(
-            {"cName": cstrn.index, "val": val},
-        )
-        # apply sensor mapping
-        mapping_sens = dict(zip(df_phi["sName"], df_phi["Phi"]))
-        # apply costraints mapping
-        mapping_cstrn = dict(zip(ctn_df["cName"], ctn_df["val"]))
-        mapping = dict(mapping_sens, **mapping_cstrn)
-    # else apply only sensor mapping
+        values.append(cstr @ phi)
+    values = np.concatenate(values)
+
+    # mode shape mapped to points, gathering the values cell by cell
+    mapped = idx >= 0
+    if out is None:
+        phi_map = fill.copy()
     else:
-        mapping = dict(zip(df_phi["sName"], df_phi["Phi"]))
+        phi_map = out
+        np.copyto(phi_map, fill)
+    phi_map[mapped] = values[idx[mapped]]
+    return phi_map
+
+
+# -----------------------------------------------------------------------------
+
+
+def dfphi_map_func(phi, sens_names, sens_map, cstrn=None, map_idx=None) -> pd.DataFrame:
+    """
+    Maps mode shapes to sensor locations and constraints, creating a dataframe.
+
+    Parameters
+    ----------
+    phi : np.ndarray
+        Array of mode shapes.
+    sens_names : list
+        List of sensor names corresponding to the mode shapes.
+    sens_map : pd.DataFrame
+        DataFrame containing the sensor mappings.
+    cstrn : pd.DataFrame, optional
+        DataFrame containing constraints, by default None.
+    map_idx : tuple, optional
+        Mapping indices as returned by ``dfphi_map_index``. If None (default) they
+        are computed from ``sens_names``, ``sens_map`` and ``cstrn``.
 
-    # mode shape mapped to points
-    df_phi_map = sens_map.replace(mapping).astype(float)
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with mode shapes mapped to sensor points.
+    """
+    phi_map = dfphi_map_array(phi, sens_names, sens_map, cstrn=cstrn, map_idx=map_idx)
+    df_phi_map = pd.DataFrame(phi_map, index=sens_map.index, columns=sens_map.columns)
     return df_phi_map
 
 
@@ -1336,8 +1429,8 @@ def pre_multisetup(
         # Y.append({"ref": np.array(ref).reshape(n_ref,-1)})
         Y.append(
             {
-                "ref": np.array(ref).T.reshape(n_ref, -1),
-                "mov": np.array(mov).T.reshape(
+                "ref": np.ascontiguousarray(ref.T).reshape(n_ref, -1),
+                "mov": np.ascontiguousarray(mov.T).reshape(
                     (n_sens - n_ref),
                     -1,
                 ),
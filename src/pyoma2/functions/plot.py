@@ -15,9 +15,11 @@ import numpy as np
 from matplotlib.colors import to_rgba
 from matplotlib.lines import Line2D
 from matplotlib.ticker import MultipleLocator
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 from scipy import signal, stats
 from scipy.interpolate import interp1d
 
+from .fdd import SD_svals_db
 from .gen import MAC
 
 logger = logging.getLogger(__name__)
@@ -629,6 +631,7 @@ def CMIF_plot(
     nSv: str = "all",
     fig: typing.Optional[plt.Figure] = None,
     ax: typing.Optional[plt.Axes] = None,
+    S_val_db: typing.Optional[np.ndarray] = None,
 ) -> typing.Tuple[plt.Figure, plt.Axes]:
     """
     Plots the Complex Mode Indicator Function (CMIF) based on given singular values and frequencies.
@@ -649,6 +652,9 @@ def CMIF_plot(
     ax : matplotlib.axes.Axes, optional
         An existing axes object to plot on. If None, new axes are created on the provided or new figure.
         Default is None.
+    S_val_db : ndarray, optional
+        The singular values in dB, as returned by ``fdd.SD_svals_db``. If None, they are
+        computed from `S_val`. Default is None.
 
     Returns
     -------
@@ -677,20 +683,15 @@ def CMIF_plot(
                 f"ERROR: nSV must be less or equal to {S_val.shape[1]}. nSV={int(nSv)}"
             ) from e
 
+    if S_val_db is None:
+        S_val_db = SD_svals_db(S_val)
+    # dB relative to the peak of the first singular value
+    ref_db = np.max(S_val_db[0])
     for k in range(nSv):
         if k == 0:
-            ax.plot(
-                freq,
-                10 * np.log10(S_val[k, k, :] / S_val[k, k, :][np.argmax(S_val[k, k, :])]),
-                "k",
-                linewidth=2,
-            )
+            ax.plot(freq, S_val_db[k] - ref_db, "k", linewidth=2)
         else:
-            ax.plot(
-                freq,
-                10 * np.log10(S_val[k, k, :] / S_val[0, 0, :][np.argmax(S_val[0, 0, :])]),
-                "grey",
-            )
+            ax.plot(freq, S_val_db[k] - ref_db, "grey")
 
     ax.set_title("Singular values of spectral matrix")
     ax.set_ylabel("dB rel. to unit")
@@ -1332,14 +1333,14 @@ def plt_quiver(
             color=color,
         )
     elif method == "2":
-        for ii in range(len(xs0)):
-            ax.plot(
-                [xs0[ii], xs1[ii]],
-                [ys0[ii], ys1[ii]],
-                [zs0[ii], zs1[ii]],
-                c=color,
-                linewidth=2,
-            )
+        had_data = ax.has_data()
+        # all the vectors in a single collection of (start, end) segments
+        segments = np.stack((nodes_coord, Points_f), axis=1)
+        ax.add_collection3d(Line3DCollection(segments, colors=color, linewidths=2))
+        # collections do not update the data limits as ax.plot does
+        ax.auto_scale_xyz(
+            segments[..., 0], segments[..., 1], segments[..., 2], had_data=had_data
+        )
     else:
         raise AttributeError("method must be either '1' or '2'!")
 
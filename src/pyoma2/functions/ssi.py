@@ -11,7 +11,7 @@ import typing
 
 import numpy as np
 from scipy import linalg
-from tqdm import tqdm, trange
+from tqdm import trange
 
 np.seterr(divide="ignore", invalid="ignore")
 logger = logging.getLogger(__name__)
@@ -21,6 +21,22 @@ logger = logging.getLogger(__name__)
 # =============================================================================
 
 
+def _hankel_blocks(Y, starts, N, out=None):
+    """
+    Stack the blocks ``Y[:, s : s + N]`` (for ``s`` in `starts`) on top of each other,
+    copying them straight into the (preallocated) output.
+    """
+    nch = Y.shape[0]
+    if out is None:
+        out = np.empty((len(starts) * nch, N), dtype=Y.dtype)
+    for ii, st in enumerate(starts):
+        out[ii * nch : (ii + 1) * nch] = Y[:, st : st + N]
+    return out
+
+
+# -----------------------------------------------------------------------------
+
+
 def build_hank(
     Y: np.ndarray,
     Yref: np.ndarray,
@@ -83,8 +99,8 @@ def build_hank(
 
     if method == "cov":
         # Future and past Output (Y^+ and Y^-)
-        Yf = np.vstack([Y[:, q + i : N + q + i] for i in range(p + 1)])
-        Yp = np.vstack([Yref[:, (q - 1) + i : N + (q - 1) + i] for i in range(0, -q, -1)])
+        Yf = _hankel_blocks(Y, [q + i for i in range(p + 1)], N)
+        Yp = _hankel_blocks(Yref, [(q - 1) + i for i in range(0, -q, -1)], N)
 
         Hank = np.dot(Yf, Yp.T) / N
 
@@ -151,11 +167,13 @@ def build_hank(
 
     elif method == "dat":
         # Efficient method for assembling the Hankel matrix for data-driven SSI
-        Yf = np.vstack([Y[:, q + i : N + q + i] for i in range(p + 1)])
-        Yp = np.vstack([Yref[:, (q - 1) + i : N + (q - 1) + i] for i in range(0, -q, -1)])
-        Ys = np.vstack((Yp / np.sqrt(N), Yf / np.sqrt(N)))
+        # Past and future Output (Y^- and Y^+) assembled in place, one above the other
+        Ys = np.empty((r * q + l * (p + 1), N), dtype=np.result_type(Y, Yref))
+        _hankel_blocks(Yref, [(q - 1) + i for i in range(0, -q, -1)], N, out=Ys[: r * q])
+        _hankel_blocks(Y, [q + i for i in range(p + 1)], N, out=Ys[r * q :])
 
-        R21 = np.linalg.qr(Ys.T, mode="r").T
+        # R is linear in the data, the 1/sqrt(N) scaling is applied to it afterwards
+        R21 = np.linalg.qr(Ys.T, mode="r").T / np.sqrt(N)
         Hank = R21[r * (p + 1) :, : r * (p + 1)]
 
         # Uncertainty calculations
@@ -166,11 +184,9 @@ def build_hank(
             Hvec0 = Hank.reshape(-1, order="F")  # vectorized Hankel
 
             for j in range(nb):
-                Yf_k = Yf[:, j * Nb : (j + 1) * Nb]
-                Yp_k = Yp[:, j * Nb : (j + 1) * Nb]
-                Ys_k = np.vstack((Yp_k / np.sqrt(Nb), Yf_k / np.sqrt(Nb)))
+                Ys_k = Ys[:, j * Nb : (j + 1) * Nb]
 
-                R = np.linalg.qr(Ys_k.T, mode="r").T
+                R = np.linalg.qr(Ys_k.T, mode="r").T / np.sqrt(Nb)
                 Hdat_j = R[r * (p + 1) :, : r * (p + 1)]
 
                 Hdat_vec_j = Hdat_j.reshape(-1, order="F")
@@ -302,11 +318,12 @@ def SSI_fast(
     l = int(H.shape[0] / (br))  # noqa E741 (ambiguous variable name 'l')  Number of channels
 
     # SINGULAR VALUE DECOMPOSITION
-    U, SIG, VT = np.linalg.svd(H)
+    # (economy size, the right singular vectors are never used)
+    U, SIG, _ = np.linalg.svd(H, full_matrices=False)
 
-    S1rad = np.sqrt(np.diag(SIG))
+    S1rad = np.sqrt(SIG)
     # initializing arrays
-    Obs = np.dot(U[:, :ordmax], S1rad[:ordmax, :ordmax])  # Observability matrix
+    Obs = U[:, :ordmax] * S1rad[:ordmax]  # Observability matrix
 
     Oup = Obs[: Obs.shape[0] - l, :]
     Odw = Obs[l:, :]
@@ -385,19 +402,27 @@ def SSI_poles(
     Returns
     -------
     Fn : np.ndarray
-        Array of natural frequencies for each system order.
+        Array of natural frequencies for each system order, shape (ordmax, n_orders).
     Xi : np.ndarray
-        Array of damping ratios for each system order.
+        Array of damping ratios for each system order, shape (ordmax, n_orders).
     Phi : np.ndarray
-        Normalised (to unity) mode shapes for each system order.
+        Normalised (to unity) mode shapes for each system order,
+        shape (ordmax, n_orders, l).
     Lambdas : np.ndarray
-        Continuous-time eigenvalues for each system order.
+        Continuous-time eigenvalues for each system order, shape (ordmax, n_orders).
     Fn_std : np.ndarray, optional
         Standard deviations of natural frequencies, returned if `calc_unc` is True.
     Xi_std : np.ndarray, optional
         Standard deviations of damping ratios, returned if `calc_unc` is True.
     Phi_std : np.ndarray, optional
         Standard deviations of mode shapes, returned if `calc_unc` is True.
+
+    Notes
+    -----
+    All the pole arrays share the same leading axes (pole index, order index), with
+    n_orders = ordmax // step + 1; poles that are not found (or are discarded) are
+    stored as NaN. Labelling (``SC_apply``) and extraction (``SSI_mpe``) index the
+    arrays directly with these axes.
     """
 
     # NB Nch = l
@@ -410,14 +435,16 @@ def SSI_poles(
     S1 = np.hstack([np.eye(p * l), np.zeros((p * l, l))])
     S2 = np.hstack([np.zeros((p * l, l)), np.eye(p * l)])
 
+    # common (pole, order) layout of the pole arrays
+    shape = (ordmax, int((ordmax) / step + 1))
+    # initialization of the matrix that contains the eigenvalues
+    Lambdas = np.full(shape, np.nan, dtype=complex)
     # initialization of the matrix that contains the frequencies
-    Lambdas = np.full((ordmax, int((ordmax) / step + 1)), np.nan, dtype=complex)
-    # initialization of the matrix that contains the frequencies
-    Fn = np.full((ordmax, int((ordmax) / step + 1)), np.nan)
+    Fn = np.full(shape, np.nan)
     # initialization of the matrix that contains the damping ratios
-    Xi = np.full((ordmax, int((ordmax) / step + 1)), np.nan)
+    Xi = np.full(shape, np.nan)
     # initialization of the matrix that contains the mode shapes
-    Phi = np.full((ordmax, int((ordmax) / step + 1), l), np.nan, dtype=complex)
+    Phi = np.full((*shape, l), np.nan, dtype=complex)
 
     if calc_unc:
         nb = T.shape[1]
@@ -427,14 +454,11 @@ def SSI_poles(
         U, S, VT = np.linalg.svd(H)
 
         # initialization of the matrix that contains the frequencies
-        Fn_std = np.full((ordmax, int((ordmax) / step + 1)), np.nan)
+        Fn_std = np.full(shape, np.nan)
         # initialization of the matrix that contains the damping ratios
-        Xi_std = np.full((ordmax, int((ordmax) / step + 1)), np.nan)
+        Xi_std = np.full(shape, np.nan)
         # initialization of the matrix that contains the mode shapes
-        Phi_std = np.full(
-            (ordmax, int((ordmax) / step + 1), l),
-            np.nan,
-        )
+        Phi_std = np.full((*shape, l), np.nan)
 
         # SVD truncation at ordmax
         Un = U[:, :ordmax]
@@ -445,6 +469,10 @@ def SSI_poles(
         Q2 = np.zeros_like(Q1)
         Q3 = np.zeros_like(Q1)
         Q4 = np.zeros((l * ordmax, nb))
+        # the selection products in Eq. 36-37 do not depend on the order
+        Obs1S1 = (S1 @ Obs).T @ S1
+        Obs2S1 = (S2 @ Obs).T @ S1
+        Obs1S2 = (S1 @ Obs).T @ S2
         logger.info("... propagating uncertainty...")
         for ii in trange(1, ordmax + 1, step):
             sn_k = Sn[ii - 1, ii - 1]
@@ -476,9 +504,9 @@ def SSI_poles(
                 )
             )
             # Eq. 36-37
-            Q1[(ii - 1) * ordmax : (ii) * ordmax, :] = ((S1 @ Obs).T @ S1) @ JOHTi
-            Q2[(ii - 1) * ordmax : (ii) * ordmax, :] = ((S2 @ Obs).T @ S1) @ JOHTi
-            Q3[(ii - 1) * ordmax : (ii) * ordmax, :] = ((S1 @ Obs).T @ S2) @ JOHTi
+            Q1[(ii - 1) * ordmax : (ii) * ordmax, :] = Obs1S1 @ JOHTi
+            Q2[(ii - 1) * ordmax : (ii) * ordmax, :] = Obs2S1 @ JOHTi
+            Q3[(ii - 1) * ordmax : (ii) * ordmax, :] = Obs1S2 @ JOHTi
             Q4[(ii - 1) * l : (ii) * l, :] = (
                 np.hstack([np.eye(l), np.zeros((l, p * l))]) @ JOHTi
             )
@@ -486,8 +514,8 @@ def SSI_poles(
     logger.info("Calculating modal parameters for increasing model order...")
     for nn in trange(0, ordmax + 1, step):
         n = nn // step
-        Oi = Obs[:, :nn]
-        Oup = np.dot(S1, Oi)
+        # S1 @ Obs[:, :nn], i.e. the upper block rows (only needed for uncertainty)
+        Oup = Obs[: p * l, :nn]
         A = AA[n]
         C = CC[n]
 
@@ -496,7 +524,11 @@ def SSI_poles(
             continue
 
         # Compute modal parameters
-        lam_d, l_eigvt, r_eigvt = linalg.eig(A, left=True)  # l_eigvt=chi, r_eigvt=phi
+        # (the left eigenvectors are only needed to propagate the uncertainty)
+        if calc_unc:
+            lam_d, l_eigvt, r_eigvt = linalg.eig(A, left=True)  # l_eigvt=chi, r_eigvt=phi
+        else:
+            lam_d, r_eigvt = linalg.eig(A)
         lam_c = (np.log(lam_d)) * (1 / dt)  # to continous time
         xi = -((np.real(lam_c)) / (abs(lam_c)))  # damping ratios
         phi = np.dot(C, r_eigvt)  # N.B. this is \varphi
@@ -524,31 +556,15 @@ def SSI_poles(
             # Filtered frequencies and damping
             fn = abs(lam_c) / (2 * np.pi)  # natural frequencies
             xi = -((np.real(lam_c)) / (abs(lam_c)))  # damping ratios
-            # Expand the mask to 3D by adding a new axis (for mode shape)
-            expandedmask1 = np.expand_dims(unique_mask, axis=-1)
-            expandedmask2 = np.expand_dims(mask_damp, axis=-1)
-            # Repeat the mask along the new dimension
-            expandedmask1 = np.repeat(expandedmask1, Phi.shape[2], axis=-1)
-            expandedmask2 = np.repeat(expandedmask2, Phi.shape[2], axis=-1)
-            # mask the values
-            phi1 = np.where(expandedmask1, phi.T, np.nan)
-            phi1 = np.where(expandedmask2, phi1, np.nan)
-            phi = phi1.T
+            # mask the values (the masks broadcast over the mode shape components)
+            phi = np.where(unique_mask & mask_damp, phi, np.nan)
 
         try:
             # Normalisation to unity
             idx = np.argmax(abs(phi), axis=0)
-            phi = (
-                np.array(
-                    [
-                        phi[:, ii] / phi[np.argmax(abs(phi[:, ii])), ii]
-                        for ii in range(phi.shape[1])
-                    ]
-                )
-                .reshape(-1, l)
-                .T
-            )
-            vmaxs = [phi[idx[k1], k1] for k1 in range(len(idx))]
+            cols = np.arange(phi.shape[1])
+            phi = phi / phi[idx, cols]
+            vmaxs = phi[idx, cols]
         except Exception as e:
             logging.debug(f"Ignored exception during normalization: {e}")
             pass
@@ -932,48 +948,38 @@ def SSI_mpe(
             order_out = None
     # =============================================================================
     # OPZIONE 2 order = int
-    # -----------------------------------------------------------------------------
-    elif isinstance(order, int):
-        order = int(order / step)
-        for fj in tqdm(freq_ref):
-            sel = np.nanargmin(np.abs(Fn_pol[:, order] - fj))
-            fns_at_ord_ii = Fn_pol[:, order][sel]
-            check = np.isclose(fns_at_ord_ii, freq_ref, rtol=rtol)
-            if not check.any():
-                logger.warning("Could not find any values")
-                order_out = order
-            else:
-                sel_freq.append(Fn_pol[:, order][sel])
-                sel_xi.append(Xi_pol[:, order][sel])
-                sel_phi.append(Phi_pol[:, order][sel, :])
-                if Fn_std is not None:
-                    sel_freq_cov.append(Fn_std[:, order][sel])
-                    sel_Xi_std.append(Xi_std[:, order][sel])
-                    sel_Phi_std.append(Phi_std[:, order][sel, :])
-                order_out = order * step
-    # =============================================================================
     # OPZIONE 3 order = list[int]
+    # here all the modes are searched at once, one (fixed) order column each
     # -----------------------------------------------------------------------------
-    elif isinstance(order, list):
-        # Convert each element in the order list to model orders
-        order = [int(o / step) for o in order]
-        order_out = np.array(order)
-        for ii, fj in enumerate(tqdm(freq_ref)):
-            sel = np.nanargmin(np.abs(Fn_pol[:, order[ii]] - fj))
-            fns_at_ord_ii = Fn_pol[:, order[ii]][sel]
-            check = np.isclose(fns_at_ord_ii, freq_ref, rtol=rtol)
-            if not check.any():
-                logger.warning("Could not find any values")
-                order_out[ii] = order[ii]
-            else:
-                sel_freq.append(Fn_pol[:, order[ii]][sel])
-                sel_xi.append(Xi_pol[:, order[ii]][sel])
-                sel_phi.append(Phi_pol[:, order[ii]][sel, :])
-                if Fn_std is not None:
-                    sel_freq_cov.append(Fn_std[:, order[ii]][sel])
-                    sel_Xi_std.append(Xi_std[:, order[ii]][sel])
-                    sel_Phi_std.append(Phi_std[:, order[ii]][sel, :])
-                order_out[ii] = order[ii] * step
+    elif isinstance(order, (int, list)):
+        freq_ref = np.asarray(freq_ref, dtype=float)
+        nsel = len(freq_ref)
+        # Convert the order(s) to column indices of the pole arrays
+        if isinstance(order, int):
+            ords = np.full(nsel, int(order / step))
+        else:
+            ords = np.array([int(o / step) for o in order], dtype=int)
+        cols = ords[:nsel]
+        # closest pole to each selected frequency at its own order
+        sel = np.nanargmin(np.abs(Fn_pol[:, cols] - freq_ref), axis=0)
+        fns = Fn_pol[sel, cols]
+        check = np.isclose(fns[:, None], freq_ref, rtol=rtol).any(axis=1)
+        for _ in range(nsel - np.count_nonzero(check)):
+            logger.warning("Could not find any values")
+        sel, cols = sel[check], cols[check]
+        sel_freq = fns[check]
+        sel_xi = Xi_pol[sel, cols]
+        sel_phi = Phi_pol[sel, cols, :]
+        if Fn_std is not None:
+            sel_freq_cov = Fn_std[sel, cols]
+            sel_Xi_std = Xi_std[sel, cols]
+            sel_Phi_std = Phi_std[sel, cols, :]
+        if isinstance(order, int):
+            order = int(order / step)
+            order_out = order * step if nsel and check[-1] else order
+        else:
+            order_out = ords.copy()
+            order_out[:nsel] = np.where(check, ords[:nsel] * step, ords[:nsel])
     else:
         raise AttributeError(
             'order must be either of type(int), type(list(int)) or "find_min"'
@@ -5,7 +5,9 @@ import typing
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+
+from pyoma2.functions.gen import dfphi_map_index
 
 
 class BaseGeometry(BaseModel):
@@ -107,6 +109,25 @@ class Geometry2(BaseGeometry):
     bg_surf : numpy.ndarray of shape (q, 3), optional
         An array of background surfaces, where each entry is a node index.
         Default is None.
+    phi_map_idx : tuple
+        Indices mapping the mode shapes to the points, as returned by
+        ``dfphi_map_index`` (read-only, computed at construction and again after a
+        field of the geometry is assigned).
+    pts_coord_arr : numpy.ndarray of shape (n, 3)
+        Coordinates of the points as a C-contiguous float array (read-only).
+    sens_sign_arr : numpy.ndarray of shape (n, 3) or None
+        Signs of the sensors as a C-contiguous float array (read-only), None if
+        ``sens_sign`` is not given.
+    revision : int
+        Counter increased every time the cached arrays are dropped (see ``refresh``),
+        so that arrays derived from the geometry elsewhere (e.g. by the plotters) can
+        be validated.
+
+    Note
+    -----
+    The arrays derived from the geometry are cached and rebuilt only when a field is
+    assigned (e.g. ``geo.sens_map = new_map``). DataFrames edited in place (e.g.
+    ``geo.sens_map.iloc[0, 0] = "ch1"``) are not detected: call ``refresh`` afterwards.
     """
 
     # MANDATORY
@@ -116,3 +137,68 @@ class Geometry2(BaseGeometry):
     cstrn: typing.Optional[pd.DataFrame] = None
     sens_sign: typing.Optional[pd.DataFrame] = None  # sensors sign
     sens_surf: typing.Optional[npt.NDArray[np.int64]] = None  # surfaces between sensors
+    # PRIVATE
+    _phi_map_idx: typing.Optional[typing.Tuple[np.ndarray, np.ndarray]] = PrivateAttr(
+        default=None
+    )
+    _arrays: typing.Dict[str, np.ndarray] = PrivateAttr(default_factory=dict)
+    _revision: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: typing.Any) -> None:
+        """Compute the mode shapes to points mapping once, at construction."""
+        self._update_phi_map_idx()
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Drop the cached arrays derived from the geometry, so that they are rebuilt on
+        their next access. Called on every assignment of a field, it must be called
+        explicitly after editing one of the DataFrames in place.
+        """
+        self._phi_map_idx = None
+        self._arrays.clear()
+        self._revision += 1
+
+    @property
+    def revision(self) -> int:
+        """Counter increased at every ``refresh``, to validate caches built on it."""
+        return self._revision
+
+    def _update_phi_map_idx(self) -> None:
+        idx, fill = dfphi_map_index(self.sens_names, self.sens_map, cstrn=self.cstrn)
+        idx.flags.writeable = False
+        fill.flags.writeable = False
+        self._phi_map_idx = (idx, fill)
+
+    @property
+    def phi_map_idx(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Indices mapping the mode shapes to the points (see ``dfphi_map_index``)."""
+        if self._phi_map_idx is None:
+            self._update_phi_map_idx()
+        return self._phi_map_idx
+
+    def _array(self, name: str) -> typing.Optional[np.ndarray]:
+        """Values of the DataFrame field `name` as a read-only float array."""
+        df = getattr(self, name)
+        if df is None:
+            return None
+        arr = self._arrays.get(name)
+        if arr is None:
+            arr = np.ascontiguousarray(df.to_numpy(), dtype=float)
+            arr.flags.writeable = False
+            self._arrays[name] = arr
+        return arr
+
+    @property
+    def pts_coord_arr(self) -> np.ndarray:
+        """Coordinates of the points as an array of shape (n, 3)."""
+        return self._array("pts_coord")
+
+    @property
+    def sens_sign_arr(self) -> typing.Optional[np.ndarray]:
+        """Signs of the sensors as an array of shape (n, 3), None if not given."""
+        return self._array("sens_sign")
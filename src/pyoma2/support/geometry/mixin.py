@@ -47,6 +47,29 @@ class GeometryMixin:
 
     geo1: typing.Optional[Geometry1] = None
     geo2: typing.Optional[Geometry2] = None
+    # plotters kept between the plots, one per plotter class (see `_get_plotter`)
+    _plotters: typing.Optional[dict] = None
+
+    def __getstate__(self) -> dict:
+        # the plotters (and their figures) are not saved with the setup
+        state = self.__dict__.copy()
+        state.pop("_plotters", None)
+        return state
+
+    def _get_plotter(self, cls, geo, res: typing.Optional[BaseResult] = None):
+        """
+        Plotter of class `cls` for `geo` and `res`, kept on the setup so that
+        successive plots reuse its figure and caches. A new plotter is created when
+        the geometry has been redefined.
+        """
+        if self._plotters is None:
+            self._plotters = {}
+        plotter = self._plotters.get(cls)
+        if plotter is None or plotter.geo is not geo:
+            plotter = self._plotters[cls] = cls(geo, res)
+        else:
+            plotter.res = res
+        return plotter
 
     def def_geo1(
         self,
@@ -520,6 +543,7 @@ class GeometryMixin:
         col_BG_nodes: str = "gray",
         col_BG_lines: str = "gray",
         col_BG_surf: str = "gray",
+        reuse_fig: bool = True,
     ) -> typing.Tuple[plt.Figure, plt.Axes]:
         """
         Plots the mode shapes for the first geometry setup (geo1) using Matplotlib.
@@ -547,6 +571,9 @@ class GeometryMixin:
             Color of the background lines in the plot. Default is 'gray'.
         col_BG_surf : str, optional
             Color of the background surfaces in the plot. Default is 'gray'.
+        reuse_fig : bool, optional
+            If True (default), the figure of the previous mode shape plot of geo1, if
+            still open, is cleared and reused. Set it to False to draw on a new figure.
 
         Returns
         -------
@@ -563,7 +590,7 @@ class GeometryMixin:
 
         if algo_res.Fn is None:
             raise ValueError("Run algorithm first")
-        Plotter = Geo1MplPlotter(self.geo1, algo_res)
+        Plotter = self._get_plotter(Geo1MplPlotter, self.geo1, algo_res)
 
         fig, ax = Plotter.plot_mode(
             mode_nr,
@@ -574,6 +601,7 @@ class GeometryMixin:
             col_BG_nodes,
             col_BG_lines,
             col_BG_surf,
+            reuse_fig=reuse_fig,
         )
         return fig, ax
 
@@ -640,7 +668,7 @@ class GeometryMixin:
         if algo_res.Fn is None:
             raise ValueError("Run algorithm first")
 
-        Plotter = PvGeoPlotter(self.geo2, algo_res)
+        Plotter = self._get_plotter(PvGeoPlotter, self.geo2, algo_res)
 
         pl = Plotter.plot_mode(
             mode_nr=mode_nr,
@@ -665,6 +693,7 @@ class GeometryMixin:
         view: typing.Literal["3D", "xy", "xz", "yz"] = "3D",
         color: str = "cmap",
         *args,
+        reuse_fig: bool = True,
         **kwargs,
     ) -> typing.Tuple[plt.Figure, plt.Axes]:
         """
@@ -685,6 +714,9 @@ class GeometryMixin:
             The viewing plane or angle for the plot. Default is '3D'.
         color : str, optional
             Color scheme or colormap to be used for the mode shapes. Default is 'cmap'.
+        reuse_fig : bool, optional
+            If True (default), the figure of the previous mode shape plot of geo2, if
+            still open, is cleared and reused. Set it to False to draw on a new figure.
 
         Returns
         -------
@@ -702,9 +734,9 @@ class GeometryMixin:
         if algo_res.Fn is None:
             raise ValueError("Run algorithm first")
 
-        Plotter = Geo2MplPlotter(self.geo2, algo_res)
+        Plotter = self._get_plotter(Geo2MplPlotter, self.geo2, algo_res)
 
-        fig, ax = Plotter.plot_mode(mode_nr, scaleF, view, color)
+        fig, ax = Plotter.plot_mode(mode_nr, scaleF, view, color, reuse_fig=reuse_fig)
         return fig, ax
 
     # PLOT MODI - PyVista plotter
@@ -719,6 +751,7 @@ class GeometryMixin:
         plot_surf: bool = True,
         def_sett: dict = "default",
         saveGIF: bool = False,
+        workers: typing.Optional[int] = None,
         *args,
         **kwargs,
     ) -> "pv.Plotter":
@@ -748,6 +781,11 @@ class GeometryMixin:
             Settings for the deformed mode shapes. Default is 'default'.
         saveGIF : bool, optional
             Whether to save the animation as a GIF. Default is False.
+        workers : int, optional
+            Number of processes rendering the frames of the GIF in parallel, see
+            ``PvGeoPlotter.animate_mode`` (scripts using it must guard their entry
+            point with ``if __name__ == "__main__":``). Default is None (sequential
+            rendering).
 
         Returns
         -------
@@ -765,7 +803,7 @@ class GeometryMixin:
         if algo_res.Fn is None:
             raise ValueError("Run algorithm first")
 
-        Plotter = PvGeoPlotter(self.geo2, algo_res)
+        Plotter = self._get_plotter(PvGeoPlotter, self.geo2, algo_res)
 
         pl = Plotter.animate_mode(
             mode_nr=mode_nr,
@@ -775,5 +813,6 @@ class GeometryMixin:
             def_sett=def_sett,
             saveGIF=saveGIF,
             pl=None,
+            workers=workers,
         )
         return pl
@@ -12,7 +12,7 @@ import typing
 import matplotlib.pyplot as plt
 import numpy as np
 
-from pyoma2.functions.gen import dfphi_map_func
+from pyoma2.functions.gen import dfphi_map_array
 from pyoma2.functions.plot import (
     plt_lines,
     plt_nodes,
@@ -25,14 +25,35 @@ from pyoma2.functions.plot import (
 from .data import Geometry1, Geometry2
 from .plotter import BasePlotter, T_Geo
 
+if typing.TYPE_CHECKING:
+    from pyoma2.algorithms.data.result import BaseResult
+
 
 class MplPlotter(BasePlotter[T_Geo]):
     """An abstract base class for plotting geometry and mode shapes using Matplotlib."""
 
-    def _create_figure(self):
-        """Create and return a new figure and 3D axis."""
+    def __init__(self, geo: T_Geo, res: typing.Optional[BaseResult] = None):
+        super().__init__(geo, res)
+        # figure and axis of the last mode shape plot of this plotter
+        self._mode_fig: typing.Optional[typing.Tuple[plt.Figure, plt.Axes]] = None
+
+    def _create_figure(self, reuse: bool = False):
+        """
+        Create and return a new figure and 3D axis.
+
+        If `reuse` is True and the figure of the previous mode shape plot of this
+        plotter is still open, its axis is cleared and the figure is returned instead,
+        so that cycling through the modes does not rebuild the (expensive) 3D axes.
+        """
+        if reuse and self._mode_fig is not None:
+            fig, ax = self._mode_fig
+            if plt.fignum_exists(fig.number):
+                ax.cla()
+                return fig, ax
         fig = plt.figure(figsize=(8, 8), tight_layout=True)
         ax = fig.add_subplot(111, projection="3d")
+        if reuse:
+            self._mode_fig = (fig, ax)
         return fig, ax
 
     def _set_common_options(self, ax, scaleF, view):
@@ -155,6 +176,7 @@ class Geo1MplPlotter(MplPlotter[Geometry1]):
         col_BG_nodes: str = "gray",
         col_BG_lines: str = "gray",
         col_BG_surf: str = "gray",
+        reuse_fig: bool = True,
     ) -> typing.Tuple[plt.Figure, plt.Axes]:
         """
         Plots a 3D mode shape for a specified mode number using the Geometry1 object.
@@ -175,6 +197,10 @@ class Geo1MplPlotter(MplPlotter[Geometry1]):
             Whether to remove grid from the plot. Default is True.
         remove_axis : bool, optional
             Whether to remove axis from the plot. Default is True.
+        reuse_fig : bool, optional
+            If True (default), the figure of the previous mode shape plot of this
+            plotter, if still open, is cleared and reused. Set it to False to draw on a
+            new figure, e.g. to keep several mode shapes side by side.
 
         Returns
         -------
@@ -185,10 +211,11 @@ class Geo1MplPlotter(MplPlotter[Geometry1]):
             raise ValueError("Run algorithm first")
 
         # Select the (real) mode shape
-        phi = self.res.Phi[:, int(mode_nr - 1)].real
-        fn = self.res.Fn[int(mode_nr - 1)]
+        idx = int(mode_nr) - 1
+        phi = self.res.Phi.real[:, idx]
+        fn = self.res.Fn[idx]
 
-        fig, ax = self._create_figure()
+        fig, ax = self._create_figure(reuse=reuse_fig)
         # Set title
         ax.set_title(f"Mode nr. {mode_nr}, $f_n$={fn:.3f}Hz")
 
@@ -269,12 +296,12 @@ class Geo2MplPlotter(MplPlotter[Geometry2]):
         fig, ax = self._create_figure()
 
         # plot sensors'
-        pts = self.geo.pts_coord.to_numpy()[:, :]
+        pts = self.geo.pts_coord_arr
         plt_nodes(ax, pts, color="red")
 
         # plot sensors' directions
         ch_names = self.geo.sens_map.to_numpy()
-        s_sign = self.geo.sens_sign.to_numpy().astype(float)
+        s_sign = self.geo.sens_sign_arr.astype(float)
 
         zero2 = np.zeros((s_sign.shape[0], 2))
         s_sign[s_sign == 0] = np.nan
@@ -309,7 +336,7 @@ class Geo2MplPlotter(MplPlotter[Geometry2]):
             # if True plot
             plt_surf(
                 ax,
-                self.geo.pts_coord.values,
+                self.geo.pts_coord_arr,
                 self.geo.sens_surf,
                 color=col_sns_surf,
                 alpha=0.3,
@@ -326,6 +353,7 @@ class Geo2MplPlotter(MplPlotter[Geometry2]):
         view: typing.Literal["3D", "xy", "xz", "yz"] = "3D",
         color: str = "cmap",
         *args,
+        reuse_fig: bool = True,
         **kwargs,
     ) -> typing.Tuple[plt.Figure, plt.Axes]:
         """
@@ -347,6 +375,10 @@ class Geo2MplPlotter(MplPlotter[Geometry2]):
             Whether to remove grid from the plot. Default is True.
         remove_axis : bool, optional
             Whether to remove axis from the plot. Default is True.
+        reuse_fig : bool, optional
+            If True (default), the figure of the previous mode shape plot of this
+            plotter, if still open, is cleared and reused. Set it to False to draw on a
+            new figure, e.g. to keep several mode shapes side by side.
         *args, **kwargs
             Additional arguments for customizations.
 
@@ -359,28 +391,30 @@ class Geo2MplPlotter(MplPlotter[Geometry2]):
             raise ValueError("Run algorithm first")
 
         # Select the (real) mode shape
-        fn = self.res.Fn[int(mode_nr - 1)]
-        phi = self.res.Phi[:, int(mode_nr - 1)].real * scaleF
+        idx = int(mode_nr) - 1
+        fn = self.res.Fn[idx]
+        phi = self.res.Phi.real[:, idx] * scaleF
 
         # APPLY POINTS TO SENSOR MAPPING
-        df_phi_map = dfphi_map_func(
-            phi, self.geo.sens_names, self.geo.sens_map, cstrn=self.geo.cstrn
+        phi_map = dfphi_map_array(
+            phi,
+            self.geo.sens_names,
+            self.geo.sens_map,
+            cstrn=self.geo.cstrn,
+            map_idx=self.geo.phi_map_idx,
         )
         # add together coordinates and mode shape displacement
-        newpoints = (
-            self.geo.pts_coord.to_numpy()
-            + df_phi_map.to_numpy() * self.geo.sens_sign.to_numpy()
-        )
+        newpoints = self.geo.pts_coord_arr + phi_map * self.geo.sens_sign_arr
 
-        # create fig and ax
-        fig, ax = self._create_figure()
+        # create fig and ax (or reuse the one of the previous mode)
+        fig, ax = self._create_figure(reuse=reuse_fig)
         ax.set_title(f"Mode nr. {mode_nr}, $f_n$={fn:.3f}Hz")
 
         self._plot_background(ax, "gray", "gray", "gray")
 
         # PLOT MODE SHAPE
         if color == "cmap":
-            oldpoints = self.geo.pts_coord.to_numpy()[:, :]
+            oldpoints = self.geo.pts_coord_arr
             plt_nodes(ax, newpoints, color="cmap", initial_coord=oldpoints)
 
         else:
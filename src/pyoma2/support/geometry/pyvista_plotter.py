@@ -5,8 +5,11 @@ Created on Sat Jun  8 21:25:39 2024
 @author: dagpa
 """
 
+import multiprocessing
 import typing
 import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 
@@ -29,6 +32,11 @@ except ImportError:
     )
     pv = None
     pvqt = None
+# optional writer of the GIFs rendered in parallel (included in pyvista[all])
+try:
+    import imageio.v3 as iio
+except ImportError:
+    iio = None
 from pyoma2.algorithms.data.result import BaseResult
 from pyoma2.functions import gen
 
@@ -37,6 +45,67 @@ from .plotter import BasePlotter
 if typing.TYPE_CHECKING:
     from pyoma2.support.geometry import Geometry2
 
+# largest number of coordinates (n_frames * n_points * 3) of the animation frames that
+# are precomputed at once (16 MB in single precision); above it each frame is computed
+# when it is drawn
+ANIM_FRAMES_MAX_SIZE = 2**22
+# number of mode shapes mapped to the points kept by a plotter (see `_mapped_mode`)
+PHI_MAP_CACHE_SIZE = 16
+
+
+def _prefix_column(arr: np.ndarray, k: int) -> np.ndarray:
+    """
+    Flat VTK connectivity array for the cells in `arr` (one cell per row), i.e. every
+    row prefixed by the number of its points `k`.
+    """
+    arr = np.asarray(arr)
+    out = np.empty((arr.shape[0], arr.shape[1] + 1), dtype=np.int64)
+    out[:, 0] = k
+    out[:, 1:] = arr
+    return out.ravel()
+
+
+def _polydata(points, lines=None, faces=None) -> "pv.PolyData":
+    """
+    PolyData over `points` with the given line and face cells, each given as an array
+    with one cell per row (e.g. ``sens_lines`` and ``sens_surf``).
+
+    Regular cells are handed to VTK as offsets and connectivity directly
+    (``CellArray.from_regular_cells``) when the installed pyvista provides it, instead
+    of letting it parse the padded connectivity array.
+    """
+    from_regular = getattr(pv.CellArray, "from_regular_cells", None)
+    cells = {}
+    for key, arr, k in (("lines", lines, 2), ("faces", faces, 3)):
+        if arr is not None:
+            if from_regular is not None:
+                cells[key] = from_regular(np.asarray(arr))
+            else:
+                cells[key] = _prefix_column(arr, k)
+    return pv.PolyData(points, **cells)
+
+
+def _render_gif_frame(args) -> np.ndarray:
+    """
+    Render one frame of the mode shape animation on an off-screen plotter of its own
+    and return the image (run in the worker processes of ``animate_mode``).
+    """
+    coords, lines, surfs, scalars, def_sett, title, window_size, camera = args
+    pl = pv.Plotter(off_screen=True, window_size=window_size)
+    pl.enable_anti_aliasing("fxaa")
+    pl.add_points(coords, scalars=scalars, **def_sett)
+    if lines is not None:
+        pl.add_mesh(_polydata(coords, lines=lines), scalars=scalars, **def_sett)
+    if surfs is not None:
+        pl.add_mesh(_polydata(coords, faces=surfs), scalars=scalars, **def_sett)
+    pl.add_text(title, position="upper_edge", color="black")
+    pl.add_axes(line_width=5, labels_off=False)
+    # same view as the plotter of the animation
+    pl.camera_position = camera
+    img = pl.screenshot(return_img=True)
+    pl.close()
+    return img
+
 
 class PvGeoPlotter(BasePlotter[Geometry2]):
     """
@@ -71,6 +140,70 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
                 "Optional package 'pyvista' is not installed. Some features may not be available."
                 "Install 'pyvista' with 'pip install pyvista' or 'pip install pyoma_2[pyvista]'"
             )
+        # geometry arrays used by every plot, with the geometry and revision they were
+        # converted from (see `_geo_arrays`)
+        self._geo_cache = None
+        self._phi_map_cache = OrderedDict()
+        # geometry and revision the cached mappings were computed on
+        self._phi_map_geo = None
+
+    def _geo_arrays(self) -> typing.Tuple[np.ndarray, ...]:
+        """
+        Points, sensor signs, lines and surfaces of the geometry in the layout used by
+        VTK (single precision points and connectivity as 64-bit VTK ids).
+
+        They are converted again only when the geometry is replaced or changes (see
+        ``Geometry2.refresh``), so that every plot follows the current geometry.
+        """
+        geo = self.geo
+        cache = self._geo_cache
+        if cache is None or cache[0] is not geo or cache[1] != geo.revision:
+            arrays = (
+                geo.pts_coord_arr.astype(np.float32),
+                None if geo.sens_sign is None else geo.sens_sign_arr.astype(np.float32),
+                None
+                if geo.sens_lines is None
+                else np.ascontiguousarray(geo.sens_lines, dtype=np.int64),
+                None
+                if geo.sens_surf is None
+                else np.ascontiguousarray(geo.sens_surf, dtype=np.int64),
+            )
+            cache = self._geo_cache = (geo, geo.revision, arrays)
+        return cache[2]
+
+    def _mapped_mode(self, mode_nr: int, scaleF: float) -> np.ndarray:
+        """
+        Mode shape `mode_nr` scaled by `scaleF` and mapped to the points, with the
+        shape of ``geo.sens_map``.
+
+        The last `PHI_MAP_CACHE_SIZE` mappings are kept, so that plotting and animating
+        the same mode maps it only once. They are looked up by the values of the mode
+        shape (so that a result updated by a new ``mpe`` is mapped again) and dropped
+        when the geometry changes. The returned array is read-only.
+        """
+        geo = self.geo
+        cached_on = self._phi_map_geo
+        if cached_on is None or cached_on[0] is not geo or cached_on[1] != geo.revision:
+            self._phi_map_cache.clear()
+            self._phi_map_geo = (geo, geo.revision)
+        phi = self.res.Phi.real[:, int(mode_nr) - 1]
+        key = (float(scaleF), phi.tobytes())
+        phi_map = self._phi_map_cache.get(key)
+        if phi_map is None:
+            phi_map = gen.dfphi_map_array(
+                phi * scaleF,
+                geo.sens_names,
+                geo.sens_map,
+                cstrn=geo.cstrn,
+                map_idx=geo.phi_map_idx,
+            )
+            phi_map.flags.writeable = False
+            self._phi_map_cache[key] = phi_map
+            if len(self._phi_map_cache) > PHI_MAP_CACHE_SIZE:
+                self._phi_map_cache.popitem(last=False)
+        else:
+            self._phi_map_cache.move_to_end(key)
+        return phi_map
 
     def plot_geo(
         self,
@@ -152,24 +285,21 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
             surf_sett = undef_sett
 
         # GEOMETRY
-        points = geo.pts_coord.to_numpy()
-        lines = geo.sens_lines
-        surfs = geo.sens_surf
-        # geometry in pyvista format
-        if lines is not None:
-            lines = np.array([np.hstack([2, line]) for line in lines])
-        if surfs is not None:
-            surfs = np.array([np.hstack([3, surf]) for surf in surfs])
+        points, sens_sign, lines, surfs = self._geo_arrays()
 
         # PLOTTING
         if plot_points:
             pl.add_points(points, **points_sett)
-        if plot_lines:
-            line_mesh = pv.PolyData(points, lines=lines)
-            pl.add_mesh(line_mesh, **lines_sett)
-        if plot_surf:
-            face_mesh = pv.PolyData(points, faces=surfs)
-            pl.add_mesh(face_mesh, **surf_sett)
+        if plot_lines and plot_surf and lines_sett == surf_sett:
+            # same style: a single mesh holding both the lines and the faces
+            pl.add_mesh(_polydata(points, lines=lines, faces=surfs), **lines_sett)
+        else:
+            if plot_lines:
+                line_mesh = _polydata(points, lines=lines)
+                pl.add_mesh(line_mesh, **lines_sett)
+            if plot_surf:
+                face_mesh = _polydata(points, faces=surfs)
+                pl.add_mesh(face_mesh, **surf_sett)
 
         # # Add axes
         # pl.add_axes(line_width=5, labels_off=False)
@@ -202,7 +332,7 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
                 if elem != "nan":
                     vector = [0, 0, 0]
                     # vector[j] = 1
-                    vector[j] = geo.sens_sign.values[i, j]
+                    vector[j] = sens_sign[i, j]
                     directions.append(vector)
                     points_new.append(row2)
 
@@ -274,7 +404,6 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
             If the result (`Res`) data is not provided when plotting a mode shape.
         """
         # import geometry and results
-        geo = self.geo
         res = self.res
 
         # define the plotter object type
@@ -297,49 +426,37 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
             undef_sett = undef_settings
 
         # GEOMETRY
-        points = geo.pts_coord.to_numpy()
-        lines = geo.sens_lines
-        surfs = geo.sens_surf
-        # geometry in pyvista format
-        if lines is not None:
-            lines = np.array([np.hstack([2, line]) for line in lines])
-        if surfs is not None:
-            surfs = np.array([np.hstack([3, surf]) for surf in surfs])
+        points, sens_sign, lines, surfs = self._geo_arrays()
 
         # Mode shape
-        if res is not None:
-            phi = res.Phi[:, int(mode_nr - 1)].real * scaleF
-        else:
+        idx = int(mode_nr) - 1
+        if res is None:
             raise ValueError("You must pass the Res class to plot a mode shape!")
 
         # APPLY POINTS TO SENSOR MAPPING
-        df_phi_map = gen.dfphi_map_func(
-            phi, geo.sens_names, geo.sens_map, cstrn=geo.cstrn
-        )
+        phi_map = self._mapped_mode(mode_nr, scaleF)
         # calculate deformed shape (NEW POINTS)
-        newpoints = points + df_phi_map.to_numpy() * geo.sens_sign.to_numpy()
+        newpoints = points + phi_map * sens_sign
+
+        # lines and faces share the style, so they are drawn as a single mesh
+        cells = dict(
+            lines=lines if plot_lines else None, faces=surfs if plot_surf else None
+        )
 
         # If true plot undeformed shape
         if plot_undef:
             pl.add_points(points, **undef_sett)
-            if plot_lines:
-                line_mesh = pv.PolyData(points, lines=lines)
-                pl.add_mesh(line_mesh, **undef_sett)
-            if plot_surf:
-                face_mesh = pv.PolyData(points, faces=surfs)
-                pl.add_mesh(face_mesh, **undef_sett)
+            if plot_lines or plot_surf:
+                pl.add_mesh(_polydata(points, **cells), **undef_sett)
 
         # PLOT MODE SHAPE
-        pl.add_points(newpoints, scalars=df_phi_map.values, **def_sett)
-        if plot_lines:
-            line_mesh = pv.PolyData(newpoints, lines=lines)
-            pl.add_mesh(line_mesh, scalars=df_phi_map.values, **def_sett)
-        if plot_surf:
-            face_mesh = pv.PolyData(newpoints, faces=surfs)
-            pl.add_mesh(face_mesh, scalars=df_phi_map.values, **def_sett)
+        pl.add_points(newpoints, scalars=phi_map, **def_sett)
+        if plot_lines or plot_surf:
+            mesh = _polydata(newpoints, **cells)
+            pl.add_mesh(mesh, scalars=phi_map, **def_sett)
 
         pl.add_text(
-            rf"Mode nr. {mode_nr}, fn = {res.Fn[mode_nr-1]:.3f}Hz",
+            rf"Mode nr. {mode_nr}, fn = {res.Fn[idx]:.3f}Hz",
             position="upper_edge",
             color="black",
             # font_size=26,
@@ -358,6 +475,7 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
         def_sett: dict = "default",
         saveGIF: bool = False,
         pl=None,
+        workers: typing.Optional[int] = None,
     ) -> "pv.Plotter":
         """
         Animate the mode shape for the given mode number.
@@ -378,6 +496,15 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
             If True, the animation is saved as a GIF (default is False).
         pl : pyvista.Plotter, optional
             Existing plotter instance to use (default is None, which creates a new plotter).
+        workers : int, optional
+            Number of processes rendering the frames of the GIF in parallel, each on an
+            off-screen plotter with the window size, camera and anti-aliasing of `pl`
+            (only used with `saveGIF`, requires `imageio`). Default is None, rendering
+            the frames one after the other on `pl`. The processes are started with the
+            "spawn" method, so that they do not inherit the Qt/VTK state of this
+            process: scripts using this option must guard their entry point with
+            ``if __name__ == "__main__":`` and VTK must support off-screen rendering
+            (e.g. an OSMesa or EGL build on headless machines).
 
         Returns
         -------
@@ -390,25 +517,33 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
             def_sett = def_settings
 
         # import geometry and results
-        geo = self.geo
         res = self.res
-        points = pv.pyvista_ndarray(geo.pts_coord.to_numpy())
-        lines = geo.sens_lines
-        surfs = geo.sens_surf
-
-        if lines is not None:
-            lines = np.array([np.hstack([2, line]) for line in lines])
-        if surfs is not None:
-            surfs = np.array([np.hstack([3, surf]) for surf in surfs])
+        points, sens_sign, lines, surfs = self._geo_arrays()
 
         # Mode shape
-        phi = res.Phi[:, int(mode_nr - 1)].real * scaleF
+        idx = int(mode_nr) - 1
 
         # mode shape mapped to points
-        df_phi_map = gen.dfphi_map_func(
-            phi, geo.sens_names, geo.sens_map, cstrn=geo.cstrn
+        phi_map = self._mapped_mode(mode_nr, scaleF)
+        # displacement of the points (the deformed shape at a phase is points + disp*cos)
+        disp = (phi_map * sens_sign).astype(np.float32)
+
+        # deformed shape at every frame of the animation
+        n_frames = 30
+        cos_ph = np.cos(
+            np.linspace(0, 2 * np.pi, n_frames, endpoint=False), dtype=np.float32
         )
-        sens_sign = geo.sens_sign.to_numpy()
+        if cos_ph.size * disp.size <= ANIM_FRAMES_MAX_SIZE:
+            all_coords = points + disp * cos_ph[:, None, None]
+
+            def frame_coords(ii, out):
+                np.copyto(out, all_coords[ii])
+
+        else:
+
+            def frame_coords(ii, out):
+                np.multiply(disp, cos_ph[ii], out=out)
+                out += points
 
         # copy points since we will deform them
         points_c = points.copy()
@@ -417,65 +552,106 @@ class PvGeoPlotter(BasePlotter[Geometry2]):
             pl = pv.Plotter(off_screen=False) if saveGIF else pvqt.BackgroundPlotter()
 
         # Add initial meshes
-        def_pts = pl.add_points(points_c, scalars=df_phi_map.values, **def_sett)
+        def_pts = pl.add_points(points_c, scalars=phi_map, **def_sett)
 
         if plot_lines:
-            line_mesh = pv.PolyData(points_c, lines=lines)
-            pl.add_mesh(line_mesh, scalars=df_phi_map.values, **def_sett)
+            line_mesh = _polydata(points_c, lines=lines)
+            pl.add_mesh(line_mesh, scalars=phi_map, **def_sett)
         else:
             line_mesh = None
 
         if plot_surf:
-            face_mesh = pv.PolyData(points_c, faces=surfs)
-            pl.add_mesh(face_mesh, scalars=df_phi_map.values, **def_sett)
+            face_mesh = _polydata(points_c, faces=surfs)
+            pl.add_mesh(face_mesh, scalars=phi_map, **def_sett)
         else:
             face_mesh = None
 
         pl.add_text(
-            rf"Mode nr. {mode_nr}, fn = {res.Fn[mode_nr-1]:.3f}Hz",
+            rf"Mode nr. {mode_nr}, fn = {res.Fn[idx]:.3f}Hz",
             position="upper_edge",
             color="black",
         )
 
+        # all the meshes share a single point buffer, updated in place at every frame
+        meshes = [def_pts.mapper.dataset]
+        meshes += [mesh for mesh in (line_mesh, face_mesh) if mesh is not None]
+        coords_buf = meshes[0].points
+        for mesh in meshes[1:]:
+            mesh.points = coords_buf
+
+        def draw_frame(ii):
+            frame_coords(ii, coords_buf)
+            for mesh in meshes:
+                mesh.Modified()
+
         if saveGIF:
-            # GIF saving logic (unchanged)
             pl.enable_anti_aliasing("fxaa")
-            n_frames = 30
+            pl.add_axes(line_width=5, labels_off=False)
+            # fix the view on the first frame, so that all the frames (rendered here
+            # or in the worker processes) share the camera of `pl`
+            draw_frame(0)
+            if not pl.camera_set:
+                pl.view_isometric()
+
+        if saveGIF and workers is not None and workers > 1:
+            if iio is None:
+                raise ImportError(
+                    "Optional package 'imageio' is not installed, it is required to "
+                    "save the GIF with `workers`. Install it with 'pip install imageio'"
+                )
+            # the frames are independent: render them in parallel (in processes, as
+            # VTK rendering is not thread safe) and only write them to the GIF here
+            title = rf"Mode nr. {mode_nr}, fn = {res.Fn[idx]:.3f}Hz"
+            window_size = list(pl.window_size)
+            camera = pl.camera_position.to_list()
+            tasks = []
+            for ii in range(n_frames):
+                coords = np.empty_like(points)
+                frame_coords(ii, coords)
+                tasks.append(
+                    (
+                        coords,
+                        lines if plot_lines else None,
+                        surfs if plot_surf else None,
+                        phi_map,
+                        def_sett,
+                        title,
+                        window_size,
+                        camera,
+                    )
+                )
+            # spawned (not forked) workers do not inherit the Qt/VTK state of `pl`
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as ex:
+                images = list(ex.map(_render_gif_frame, tasks))
+            # same timing as Plotter.open_gif: 10 frames per second, endless loop
+            iio.imwrite(f"Mode nr. {mode_nr}.gif", np.stack(images), duration=100, loop=0)
+            pl.show(auto_close=False)
+
+        elif saveGIF:
             pl.open_gif(f"Mode nr. {mode_nr}.gif")
-            frames = np.linspace(0, 2 * np.pi, n_frames, endpoint=False)
-            for phase in frames:
-                new_coords = points + df_phi_map.to_numpy() * sens_sign * np.cos(phase)
-                def_pts.mapper.dataset.points = new_coords
-                if line_mesh is not None:
-                    line_mesh.points = new_coords
-                if face_mesh is not None:
-                    face_mesh.points = new_coords
-                pl.add_axes(line_width=5, labels_off=False)
+            for ii in range(n_frames):
+                draw_frame(ii)
                 pl.write_frame()
             pl.show(auto_close=False)
 
         else:
             # Interactive animation using callback
-            n_frames = 30
-            frames = np.linspace(0, 2 * np.pi, n_frames, endpoint=False)
-            self._current_frame = 0  # track current frame externally
+            pl.add_axes(line_width=5, labels_off=False)
+            current_frame = 0
 
             def update_shape():
                 # Update just one frame per callback call
-                phase = frames[self._current_frame]
-                new_coords = points + df_phi_map.to_numpy() * sens_sign * np.cos(phase)
-                def_pts.mapper.dataset.points = new_coords
-                if line_mesh is not None:
-                    line_mesh.points = new_coords
-                if face_mesh is not None:
-                    face_mesh.points = new_coords
+                nonlocal current_frame
+                draw_frame(current_frame)
                 pl.update()
 
                 # Move to the next frame
-                self._current_frame = (self._current_frame + 1) % n_frames
+                current_frame = (current_frame + 1) % n_frames
 
-            # Add the callback to run every 100 ms (for example)
-            pl.add_callback(update_shape, interval=100)
+            # one frame every 33 ms (~30 fps, a period of the mode per second)
+            pl.add_callback(update_shape, interval=33)
 
             # Make sure to start the interactive session
             # If using BackgroundPlotter, it typically shows automatically.
@@ -26,6 +26,7 @@ from matplotlib.figure import Figure
 if typing.TYPE_CHECKING:
     from pyoma2.algorithms import BaseAlgorithm
 
+from pyoma2.functions.fdd import SD_svals_db
 from pyoma2.functions.plot import CMIF_plot, stab_plot
 
 logger = logging.getLogger(__name__)
@@ -180,29 +181,28 @@ class SelFromPlot:
         """
         freq = self.algo.result.freq
         S_val = self.algo.result.S_val
+        S_val_db = self.algo.result.S_val_db
+        if S_val_db is None:
+            S_val_db = SD_svals_db(S_val)
 
+        # y-values for the selected frequencies (first singular value, rel. to peak)
+        marker_y_values = (
+            S_val_db[0, self.freq_ind] - np.max(S_val_db[0]) + 10 * np.log10(1.25)
+        )
         if not update_ticks:
             self.ax2.clear()
-            CMIF_plot(S_val, freq, freqlim=self.freqlim, fig=self.fig, ax=self.ax2)
-            # Compute the y-values for the selected frequencies
-            marker_y_values = [
-                10
-                * np.log10(
-                    (S_val[0, 0, i] / S_val[0, 0, np.argmax(S_val[0, 0, :])]) * 1.25
-                )
-                for i in self.freq_ind
-            ]
+            CMIF_plot(
+                S_val,
+                freq,
+                freqlim=self.freqlim,
+                fig=self.fig,
+                ax=self.ax2,
+                S_val_db=S_val_db,
+            )
             (self.MARKER,) = self.ax2.plot(
                 self.sel_freq, marker_y_values, "kv", markersize=8
             )
         else:
-            marker_y_values = [
-                10
-                * np.log10(
-                    (S_val[0, 0, i] / S_val[0, 0, np.argmax(S_val[0, 0, :])]) * 1.25
-                )
-                for i in self.freq_ind
-            ]
             self.MARKER.set_xdata(np.asarray(self.sel_freq))
             self.MARKER.set_ydata(marker_y_values)
 
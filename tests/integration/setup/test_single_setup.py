@@ -1,5 +1,8 @@
 import math
 import typing
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
 
 import numpy as np
 import pandas as pd
@@ -7,9 +10,14 @@ import pytest
 from scipy.signal import decimate, detrend
 
 from src.pyoma2.algorithms import FDD, FSDD, SSIcov
+from src.pyoma2.functions.gen import dfphi_map_index
 from src.pyoma2.setup import BaseSetup, SingleSetup
+from src.pyoma2.support.geometry import Geo2MplPlotter, pyvista_plotter
 from tests.factory import FakeAlgorithm, FakeAlgorithm2
 
+# lines of the palisaden geometry (0-indexed), expected in both geo1 and geo2
+EXPECTED_PALISADEN_LINES = [[3, 0], [4, 1], [5, 2], [0, 1], [1, 2], [2, 0]]
+
 
 def test_base_setup(single_setup_data_fixture, bs: BaseSetup) -> None:
     """Test BaseSetup utility functions."""
@@ -114,10 +122,7 @@ def test_geo1(single_setup_data_fixture, ss: SingleSetup) -> None:
     assert ss.geo1 is not None
     assert ss.geo1.sens_names == Names
     # bg_lines are different because the first column is 0-indexed
-    assert np.array_equal(
-        ss.geo1.bg_lines,
-        np.array([[3, 0], [4, 1], [5, 2], [0, 1], [1, 2], [2, 0]]),
-    )
+    assert ss.geo1.bg_lines.tolist() == EXPECTED_PALISADEN_LINES
     # sens_cord was reindexed
     assert ss.geo1.sens_coord.equals(
         pd.DataFrame(
@@ -142,13 +147,14 @@ def test_geo1(single_setup_data_fixture, ss: SingleSetup) -> None:
             ]
         ),
     )
-    assert np.array_equal(
-        ss.geo1.bg_nodes,
-        np.array(
-            [[2, 8, 20], [11, 8, 20], [5, 2, 20], [2, 8, 0], [11, 8, 0], [5, 2, 0]],
-            dtype=int,
-        ),
-    )
+    assert ss.geo1.bg_nodes.tolist() == [
+        [2, 8, 20],
+        [11, 8, 20],
+        [5, 2, 20],
+        [2, 8, 0],
+        [11, 8, 0],
+        [5, 2, 0],
+    ]
     assert ss.geo1.bg_surf is None
 
     # PLOT THE GEOMETRY
@@ -282,13 +288,8 @@ def test_geo2(
 
     # Test the initialization of the Geometry
     assert ss.geo2 is not None
-    assert np.array_equal(
-        ss.geo2.bg_lines,
-        np.array([[3, 0], [4, 1], [5, 2], [0, 1], [1, 2], [2, 0]]),
-    )
-    assert np.array_equal(
-        ss.geo2.sens_lines, np.array([[3, 0], [4, 1], [5, 2], [0, 1], [1, 2], [2, 0]])
-    )
+    assert ss.geo2.bg_lines.tolist() == EXPECTED_PALISADEN_LINES
+    assert ss.geo2.sens_lines.tolist() == EXPECTED_PALISADEN_LINES
     assert ss.geo2.pts_coord.equals(
         pd.DataFrame(
             {
@@ -299,6 +300,44 @@ def test_geo2(
             }
         ).set_index("ptName")
     )
+    # array views of the DataFrames
+    assert np.array_equal(ss.geo2.pts_coord_arr, ss.geo2.pts_coord.to_numpy())
+    assert not ss.geo2.pts_coord_arr.flags.writeable
+    assert np.array_equal(ss.geo2.sens_sign_arr, ss.geo2.sens_sign.to_numpy())
+    # the arrays are cached until a field is assigned
+    coord = ss.geo2.pts_coord_arr
+    assert ss.geo2.pts_coord_arr is coord
+    pts_coord = ss.geo2.pts_coord
+    ss.geo2.pts_coord = pts_coord + 1.0
+    assert ss.geo2.pts_coord_arr is not coord
+    assert np.array_equal(ss.geo2.pts_coord_arr, coord + 1.0)
+    ss.geo2.pts_coord = pts_coord
+    assert np.array_equal(ss.geo2.pts_coord_arr, coord)
+    # in-place edits are picked up after a refresh
+    coord = ss.geo2.pts_coord_arr
+    ss.geo2.pts_coord.iloc[0, 0] += 1.0
+    assert ss.geo2.pts_coord_arr is coord
+    ss.geo2.refresh()
+    assert ss.geo2.pts_coord_arr[0, 0] == coord[0, 0] + 1.0
+    ss.geo2.pts_coord.iloc[0, 0] -= 1.0
+    ss.geo2.refresh()
+
+    # the mode shapes to points mapping is cached until a field is assigned
+    idx, fill = ss.geo2.phi_map_idx
+    assert ss.geo2.phi_map_idx[0] is idx
+    sens_map = ss.geo2.sens_map.copy()
+    new_map = sens_map.copy()
+    new_map.iloc[0, 0] = "0"
+    ss.geo2.sens_map = new_map
+    new_idx, _ = ss.geo2.phi_map_idx
+    assert new_idx is not idx
+    assert np.array_equal(new_idx, dfphi_map_index(ss.geo2.sens_names, new_map)[0])
+    # in-place edits are picked up after a refresh
+    ss.geo2.sens_map.iloc[0, 0] = sens_map.iloc[0, 0]
+    assert ss.geo2.phi_map_idx[0] is new_idx
+    ss.geo2.refresh()
+    assert np.array_equal(ss.geo2.phi_map_idx[0], idx)
+    assert np.array_equal(ss.geo2.phi_map_idx[1], fill)
 
     # PLOT THE GEOMETRY
     # Call the plot_geo2 method and check that it doesn't raise an exception
@@ -383,10 +422,14 @@ def test_plot_data(
         assert False, f"plot_ch_info raised an exception {e}"
 
 
-def test_run(ss: SingleSetup) -> None:
+@pytest.fixture(scope="module")
+def ss_run(single_setup_data_fixture) -> typing.Generator[SingleSetup, None, None]:
     """
-    Test the running of the algorithms in the SingleSetup.
+    SingleSetup with both geometries and the FDD, FSDD and SSIcov algorithms run,
+    shared by the tests below that only use the results.
     """
+    data, *_ = single_setup_data_fixture
+    ss = SingleSetup(data=data, fs=100)
 
     # Define geometry1
     ss.def_geo1_by_file(
@@ -403,34 +446,62 @@ def test_run(ss: SingleSetup) -> None:
 
     # Overwrite/update run parameters for an algorithm
     fdd.run_params = FDD.RunParamCls(nxseg=512, method_SD="cor")
-    # Aggiungere esempio anche col metodo
 
     # Add algorithms to the single setup class
     ss.add_algorithms(ssicov, fsdd, fdd)
 
-    # results are none
-    assert ss["FDD"].result is None
-    assert ss["FSDD"].result is None
-    assert ss["SSIcov"].result is None
-
     # Run all or run by name
     ss.run_by_name("SSIcov")
     ss.run_by_name("FSDD")
 
     # Run all algorithms
     ss.run_all()
+    yield ss
+
+
+def test_add_algorithms(ss: SingleSetup) -> None:
+    """
+    Test that the algorithms added to the SingleSetup have no result before running.
+    """
+    ss.add_algorithms(
+        SSIcov(name="SSIcov", br=50, ordmax=80),
+        FSDD(name="FSDD", nxseg=2048, method_SD="per", pov=0.5),
+        FDD(name="FDD"),
+    )
 
+    # results are none
+    assert ss["FDD"].result is None
+    assert ss["FSDD"].result is None
+    assert ss["SSIcov"].result is None
+
+
+def test_run(ss_run: SingleSetup) -> None:
+    """
+    Test the running of the algorithms in the SingleSetup.
+    """
     # Check the result
-    assert ss["FDD"].result is not None
-    assert ss["FSDD"].result is not None
-    assert ss["SSIcov"].result is not None
+    assert ss_run["FDD"].result is not None
+    assert ss_run["FSDD"].result is not None
+    assert ss_run["SSIcov"].result is not None
 
+
+def test_plot_CMIF(ss_run: SingleSetup) -> None:
+    """
+    Test the singular values plot of the SingleSetup algorithms.
+    """
     # plot SINGULAR VALUES
     try:
-        fig, ax = fsdd.plot_CMIF(freqlim=(1, 4))
+        fig, ax = ss_run["FSDD"].plot_CMIF(freqlim=(1, 4))
     except Exception as e:
         assert False, f"plot_CMIF raised an exception {e}"
 
+
+def test_plot_stab(ss_run: SingleSetup) -> None:
+    """
+    Test the stabilisation chart and the frequency-damping clusters of SSI.
+    """
+    ssicov = ss_run["SSIcov"]
+
     # plot STABILISATION CHART for SSI
     try:
         fig4, ax4 = ssicov.plot_stab(freqlim=(1, 4), hide_poles=False)
@@ -443,41 +514,52 @@ def test_run(ss: SingleSetup) -> None:
     except Exception as e:
         assert False, f"plot_freqvsdamp raised an exception {e}"
 
+
+def test_mpe_from_plot(ss_run: SingleSetup) -> None:
+    """
+    Test the modal parameter extraction from plot of the SingleSetup algorithms.
+    """
     # run mpe_from_plot for algorithms
     try:
-        ss.mpe_from_plot("SSIcov", freqlim=(1, 4))
+        ss_run.mpe_from_plot("SSIcov", freqlim=(1, 4))
     except Exception as e:
         assert False, f"mpe_from_plot raised an exception {e} for SSIcov"
 
     try:
-        ss.mpe_from_plot("FSDD", freqlim=(1, 4))
+        ss_run.mpe_from_plot("FSDD", freqlim=(1, 4))
     except Exception as e:
         assert False, f"mpe_from_plot raised an exception {e} for FSDD"
 
     try:
-        ss.mpe_from_plot("FDD", freqlim=(1, 4))
+        ss_run.mpe_from_plot("FDD", freqlim=(1, 4))
     except Exception as e:
         assert False, f"mpe_from_plot raised an exception {e} for FDD"
 
+
+def test_mpe(ss_run: SingleSetup) -> None:
+    """
+    Test the modal parameter extraction of the SingleSetup algorithms and the plots
+    of the extracted modes.
+    """
     # run mpe for algorithms
     try:
-        ss.mpe("SSIcov", sel_freq=[1.88, 2.42, 2.68], order_in=40)
+        ss_run.mpe("SSIcov", sel_freq=[1.88, 2.42, 2.68], order_in=40)
     except Exception as e:
         assert False, f"mpe raised an exception {e} for SSIcov"
 
     try:
-        ss.mpe("FSDD", sel_freq=[1.88, 2.42, 2.68], MAClim=0.95)
+        ss_run.mpe("FSDD", sel_freq=[1.88, 2.42, 2.68], MAClim=0.95)
     except Exception as e:
         assert False, f"mpe raised an exception {e} for FSDD"
 
     try:
-        ss.mpe("FDD", sel_freq=[1.88, 2.42, 2.68])
+        ss_run.mpe("FDD", sel_freq=[1.88, 2.42, 2.68])
     except Exception as e:
         assert False, f"mpe raised an exception {e} for FDD"
 
     # plot_EFDDfit for FSDD algorithms
     try:
-        figs, axs = ss["FSDD"].plot_EFDDfit(freqlim=(1, 4))
+        figs, axs = ss_run["FSDD"].plot_EFDDfit(freqlim=(1, 4))
         assert isinstance(figs, list)
         assert isinstance(axs, list)
     except Exception as e:
@@ -485,12 +567,159 @@ def test_run(ss: SingleSetup) -> None:
 
     # PLOTE_MODE_G1
     try:
-        _ = ss.plot_mode_geo1(algo_res=fdd.result, mode_nr=2, view="3D", scaleF=2)
+        _ = ss_run.plot_mode_geo1(
+            algo_res=ss_run["FDD"].result, mode_nr=2, view="3D", scaleF=2
+        )
     except Exception as e:
         assert False, f"plot_mode_geo1 raised an exception {e} for FDD"
 
     # PLOTE_MODE_geo2
     try:
-        _ = ss.plot_mode_geo2(algo_res=fsdd.result, mode_nr=2, view="3D", scaleF=2)
+        _ = ss_run.plot_mode_geo2(
+            algo_res=ss_run["FSDD"].result, mode_nr=2, view="3D", scaleF=2
+        )
     except Exception as e:
         assert False, f"plot_mode_geo2 raised an exception {e} for FSDD"
+
+
+def test_plot_mode_reuse_fig(ss_run: SingleSetup) -> None:
+    """
+    Test that the mode shape figure is reused per plotter, and only if asked.
+    """
+    ss_run.mpe("FDD", sel_freq=[1.88, 2.42, 2.68])
+    res = ss_run["FDD"].result
+    plotter = Geo2MplPlotter(ss_run.geo2, res)
+
+    # a distinct figure per plt.figure call, all of them still open
+    with unittest.mock.patch(
+        "matplotlib.pyplot.figure", side_effect=lambda *a, **k: MagicMock()
+    ), unittest.mock.patch("matplotlib.pyplot.fignum_exists", return_value=True):
+        fig1, ax1 = plotter.plot_mode(mode_nr=1)
+        fig2, ax2 = plotter.plot_mode(mode_nr=2)
+        assert fig2 is fig1
+        ax1.cla.assert_called_once()
+        # a new figure on request
+        fig3, _ = plotter.plot_mode(mode_nr=3, reuse_fig=False)
+        assert fig3 is not fig1
+        # the figure is not shared with other plotters
+        fig4, _ = Geo2MplPlotter(ss_run.geo2, res).plot_mode(mode_nr=1)
+        assert fig4 is not fig1
+
+
+def test_setup_plot_mode_reuse_fig(ss_run: SingleSetup) -> None:
+    """
+    Test that successive mode shape plots of the setup reuse the same figure.
+    """
+    ss_run.mpe("FDD", sel_freq=[1.88, 2.42, 2.68])
+    res = ss_run["FDD"].result
+
+    # a distinct figure per plt.figure call, all of them still open
+    with unittest.mock.patch(
+        "matplotlib.pyplot.figure", side_effect=lambda *a, **k: MagicMock()
+    ), unittest.mock.patch("matplotlib.pyplot.fignum_exists", return_value=True):
+        fig1, _ = ss_run.plot_mode_geo1(algo_res=res, mode_nr=1)
+        fig2, _ = ss_run.plot_mode_geo1(algo_res=res, mode_nr=2)
+        assert fig2 is fig1
+        fig3, _ = ss_run.plot_mode_geo1(algo_res=res, mode_nr=3, reuse_fig=False)
+        assert fig3 is not fig1
+        # geo2 has a figure of its own
+        fig4, _ = ss_run.plot_mode_geo2_mpl(algo_res=res, mode_nr=1)
+        fig5, _ = ss_run.plot_mode_geo2_mpl(algo_res=res, mode_nr=2)
+        assert fig5 is fig4
+        assert fig4 is not fig1
+
+
+def test_animate_mode_gif_workers(ss_run: SingleSetup) -> None:
+    """
+    Smoke test of the GIF of the mode shape rendered by worker processes, with the
+    renderer (mocked pyvista) in threads and the GIF writer mocked.
+    """
+    ss_run.mpe("FDD", sel_freq=[1.88, 2.42, 2.68])
+    plotter = pyvista_plotter.PvGeoPlotter(ss_run.geo2, ss_run["FDD"].result)
+    n_pts = ss_run.geo2.pts_coord.shape[0]
+    # main plotter, with a real point buffer for the frames drawn on it
+    pl = MagicMock(window_size=[640, 480], camera_set=False)
+    pl.add_points.return_value.mapper.dataset.points = np.zeros(
+        (n_pts, 3), dtype=np.float32
+    )
+    camera = [(10.0, 10.0, 10.0), (0.0, 0.0, 0.0), (0.0, 0.0, 1.0)]
+    pl.camera_position.to_list.return_value = camera
+    # off-screen plotters of the workers
+    worker_pl = MagicMock()
+    worker_pl.screenshot.return_value = np.zeros((480, 640, 3), dtype=np.uint8)
+    iio = MagicMock()
+
+    with unittest.mock.patch.object(
+        pyvista_plotter.pv, "Plotter", return_value=worker_pl
+    ) as Plotter, unittest.mock.patch.object(
+        pyvista_plotter,
+        "ProcessPoolExecutor",
+        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+    ), unittest.mock.patch.object(pyvista_plotter, "iio", iio):
+        out = plotter.animate_mode(mode_nr=1, saveGIF=True, pl=pl, workers=2)
+
+    assert out is pl
+    # same settings as the sequential rendering on the main plotter
+    pl.enable_anti_aliasing.assert_called_once_with("fxaa")
+    pl.view_isometric.assert_called_once()
+    Plotter.assert_called_with(off_screen=True, window_size=[640, 480])
+    assert Plotter.call_count == 30
+    assert worker_pl.camera_position == camera
+    worker_pl.enable_anti_aliasing.assert_called_with("fxaa")
+    # the frames are written to the GIF directly, without the plotter's writer
+    pl.open_gif.assert_not_called()
+    iio.imwrite.assert_called_once()
+    path, frames = iio.imwrite.call_args.args
+    assert path == "Mode nr. 1.gif"
+    assert frames.shape == (30, 480, 640, 3)
+    pl.show.assert_called_once_with(auto_close=False)
+
+
+def test_pv_plotter_follows_geometry(ss_run: SingleSetup) -> None:
+    """
+    Test that the pyvista plotter converts the geometry again after it changes.
+    """
+    geo = ss_run.geo2
+    plotter = pyvista_plotter.PvGeoPlotter(geo)
+    points, sens_sign, lines, surfs = plotter._geo_arrays()
+    assert points.dtype == np.float32
+    assert np.array_equal(points, geo.pts_coord_arr)
+    assert lines.dtype == np.int64
+    # converted once while the geometry is unchanged
+    assert plotter._geo_arrays()[0] is points
+
+    pts_coord = geo.pts_coord
+    try:
+        geo.pts_coord = pts_coord + 1.0
+        assert np.array_equal(plotter._geo_arrays()[0], points + 1.0)
+        # in-place edits are followed after a refresh of the geometry
+        geo.sens_sign.iloc[0, 0] *= -1
+        geo.refresh()
+        assert plotter._geo_arrays()[1][0, 0] == -sens_sign[0, 0]
+    finally:
+        geo.sens_sign.iloc[0, 0] *= -1
+        geo.pts_coord = pts_coord
+
+
+def test_pv_mapped_mode_cache(ss_run: SingleSetup) -> None:
+    """
+    Test that the mode shapes mapped to the points are shared by the pyvista plots of
+    the setup, and mapped again when the result or the geometry change.
+    """
+    gen = pyvista_plotter.gen
+    ss_run.mpe("FDD", sel_freq=[1.88, 2.42, 2.68])
+    res = ss_run["FDD"].result
+    with unittest.mock.patch.object(
+        gen, "dfphi_map_array", wraps=gen.dfphi_map_array
+    ) as dfphi_map_array:
+        ss_run.plot_mode_geo2(algo_res=res, mode_nr=1, scaleF=2)
+        ss_run.anim_mode_geo2(algo_res=res, mode_nr=1, scaleF=2)
+        assert dfphi_map_array.call_count == 1
+        # new mode shapes written to the same result by mpe
+        ss_run.mpe("FDD", sel_freq=[2.42, 2.68])
+        ss_run.plot_mode_geo2(algo_res=res, mode_nr=1, scaleF=2)
+        assert dfphi_map_array.call_count == 2
+        # geometry changed
+        ss_run.geo2.refresh()
+        ss_run.plot_mode_geo2(algo_res=res, mode_nr=1, scaleF=2)
+        assert dfphi_map_array.call_count == 3
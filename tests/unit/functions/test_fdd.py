@@ -1,3 +1,5 @@
+from unittest.mock import MagicMock
+
 import numpy as np
 import pytest
 from pyoma2.functions import fdd
@@ -48,6 +50,108 @@ def test_SD_est(input_method: str) -> None:
     assert Sy.shape[0] == Yall.shape[0]  # Ensure correct shape of Sy
 
 
+@pytest.mark.parametrize("hermitian", [True, False])
+def test_SD_svalsvec(hermitian: bool) -> None:
+    rng = np.random.default_rng(0)
+    Sy = rng.random((4, 4, 50)) + 1j * rng.random((4, 4, 50))
+    if hermitian:
+        Sy = Sy + Sy.conj().transpose(1, 0, 2)
+    S_val, S_vec = fdd.SD_svalsvec(Sy)
+    assert S_val.shape == (4, 4, 50)
+    assert S_vec.shape == (4, 4, 50)
+    # same as decomposing one frequency line at a time
+    for k in range(Sy.shape[2]):
+        U, S, _ = np.linalg.svd(Sy[:, :, k])
+        assert np.allclose(np.diag(S_val[:, :, k]), np.sqrt(S))
+        # singular vectors are defined up to a phase
+        assert np.allclose(np.abs(S_vec[:, :, k] @ U), np.eye(4), atol=1e-8)
+
+
+def test_SD_svals() -> None:
+    rng = np.random.default_rng(0)
+    Sy = rng.random((4, 4, 100)) + 1j * rng.random((4, 4, 100))
+    S_val = fdd.SD_svals(Sy)
+    S_val_ref, _ = fdd.SD_svalsvec(Sy)
+    assert S_val.shape == (4, 4, 100)
+    assert np.allclose(S_val, S_val_ref)
+    # Hermitian spectra: the eigensolver gives the same singular values
+    Sy = Sy + Sy.conj().transpose(1, 0, 2)
+    assert np.allclose(
+        fdd.SD_svals(Sy, hermitian=True), fdd.SD_svals(Sy, hermitian=False)
+    )
+
+
+def test_svd_stack_gpu_fallback(monkeypatch, caplog) -> None:
+    class GPUError(Exception):
+        pass
+
+    def failing_gpu_svd(*args, **kwargs):
+        raise GPUError("no CUDA device")
+
+    monkeypatch.setattr(fdd, "cp", object())
+    monkeypatch.setattr(fdd, "_GPU_ERRORS", (GPUError,))
+    monkeypatch.setattr(fdd, "_svd_stack_gpu", failing_gpu_svd)
+    monkeypatch.setattr(fdd, "GPU_SVD_MIN_SIZE", 0)
+    monkeypatch.setattr(fdd, "_gpu_fallback_logged", False)
+    rng = np.random.default_rng(0)
+    Sy = rng.random((4, 4, 20)) + 1j * rng.random((4, 4, 20))
+    # GPU failures fall back to numpy, logging a single warning
+    with caplog.at_level("WARNING", logger=fdd.__name__):
+        S_val = fdd.SD_svals(Sy)
+        fdd.SD_svals(Sy)
+    assert len(caplog.records) == 1
+    assert "falling back to numpy" in caplog.records[0].getMessage()
+    monkeypatch.setattr(fdd, "cp", None)
+    assert np.allclose(S_val, fdd.SD_svals(Sy))
+    # any other error is raised
+    monkeypatch.setattr(fdd, "cp", object())
+    monkeypatch.setattr(fdd, "_GPU_ERRORS", ())
+    with pytest.raises(GPUError):
+        fdd.SD_svals(Sy)
+
+
+def test_fft_backend_plan_cache(monkeypatch) -> None:
+    pyfftw = MagicMock()
+    pyfftw.interfaces.cache.is_enabled.return_value = False
+    monkeypatch.setattr(fdd, "pyfftw", pyfftw)
+    monkeypatch.setattr(fdd, "_fftw_cache_checked", False)
+    monkeypatch.setattr(fdd.fft, "set_backend", MagicMock())
+    # the plan cache is enabled on the first use of the backend only
+    fdd._fft_backend()
+    fdd._fft_backend()
+    pyfftw.interfaces.cache.enable.assert_called_once()
+    pyfftw.interfaces.cache.set_keepalive_time.assert_called_once_with(60)
+    fdd.fft.set_backend.assert_called_with(pyfftw.interfaces.scipy_fft)
+    # a cache already enabled by the user is left untouched
+    pyfftw.reset_mock()
+    pyfftw.interfaces.cache.is_enabled.return_value = True
+    monkeypatch.setattr(fdd, "_fftw_cache_checked", False)
+    fdd._fft_backend()
+    pyfftw.interfaces.cache.enable.assert_not_called()
+    pyfftw.interfaces.cache.set_keepalive_time.assert_not_called()
+
+
+def test_SD_svals_from_stft() -> None:
+    rng = np.random.default_rng(0)
+    Y = rng.standard_normal((12, 1000))
+    freq, F, scale = fdd.SD_stft(Y, 0.01, nxseg=256, pov=0.5)
+    Sy = fdd.SD_from_stft(F, F, scale)
+    S_val = fdd.SD_svals_from_stft(F, scale)
+    assert F.shape[1] < F.shape[0]  # fewer segments than channels
+    assert S_val.shape == (12, 12, len(freq))
+    assert np.allclose(S_val, fdd.SD_svals(Sy))
+
+
+def test_SD_svals_db() -> None:
+    rng = np.random.default_rng(0)
+    S_val = np.zeros((3, 3, 50))
+    S_val[range(3), range(3), :] = rng.random((3, 50)) + 0.1
+    S_val_db = fdd.SD_svals_db(S_val)
+    assert S_val_db.shape == (3, 50)
+    assert S_val_db.dtype == np.float32
+    assert np.allclose(S_val_db[1], 10 * np.log10(S_val[1, 1, :]), atol=1e-4)
+
+
 def test_FDD_mpe():
     # Generate some dummy data
     Sval = np.random.rand(2, 2, 1000)
@@ -105,6 +209,20 @@ def test_SDOF_bellandMS(input_method: str) -> None:
     assert isinstance(SDOFms1, np.ndarray)
 
 
+def test_SDOF_bellandMS_rectangular() -> None:
+    rng = np.random.default_rng(0)
+    # PreGER-like spectra: 4 channels, 2 references
+    Sy = rng.random((4, 2, 100)) + 1j * rng.random((4, 2, 100))
+    phi_FDD = rng.random(4) + 1j * rng.random(4)
+    SDOFbell1, SDOFms1 = fdd.SDOF_bellandMS(Sy, 0.01, 10.0, phi_FDD, "EFDD", cm=2)
+    assert SDOFms1.shape == (100, 4)
+    # more close modes than singular vectors
+    for method in ("FSDD", "EFDD"):
+        with pytest.raises(ValueError) as e:
+            fdd.SDOF_bellandMS(Sy, 0.01, 10.0, phi_FDD, method, cm=3)
+        assert "cm (3) cannot exceed" in str(e.value)
+
+
 @pytest.mark.parametrize(
     "input_method",
     [
@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 import pytest
 from pyoma2.functions import gen
 
@@ -117,3 +118,48 @@ def test_filter_data(fs, Wn, order, btype, expected_shape) -> None:
     data = np.random.rand(100, 2)
     filt_data = gen.filter_data(data, fs, Wn, order, btype)
     assert filt_data.shape == expected_shape
+
+
+def test_dfphi_map_func() -> None:
+    sens_names = ["s1", "s2", "s3"]
+    sens_map = pd.DataFrame(
+        [["s1", 0.0, "s2"], [0.0, "c1", 0.0], ["s3", 0.0, 0.0]],
+        columns=["x", "y", "z"],
+    )
+    cstrn = pd.DataFrame([[0.5, 0.5, 0.0]], index=["c1"], columns=sens_names)
+    phi = np.array([1.0, 2.0, 3.0])
+
+    df_phi_map = gen.dfphi_map_func(phi, sens_names, sens_map, cstrn=cstrn)
+    expected = np.array([[1.0, 0.0, 2.0], [0.0, 1.5, 0.0], [3.0, 0.0, 0.0]])
+    assert list(df_phi_map.columns) == ["x", "y", "z"]
+    assert np.allclose(df_phi_map.to_numpy(), expected)
+
+    # without constraints the value of the constraint cell cannot be mapped
+    sens_map.iloc[1, 1] = 0.0
+    df_phi_map = gen.dfphi_map_func(phi, sens_names, sens_map)
+    expected[1, 1] = 0.0
+    assert np.allclose(df_phi_map.to_numpy(), expected)
+
+    # precomputed mapping indices give the same result
+    map_idx = gen.dfphi_map_index(sens_names, sens_map)
+    df_phi_map = gen.dfphi_map_func(phi, sens_names, sens_map, map_idx=map_idx)
+    assert np.allclose(df_phi_map.to_numpy(), expected)
+    phi_map = gen.dfphi_map_array(phi, sens_names, sens_map, map_idx=map_idx)
+    assert isinstance(phi_map, np.ndarray)
+    assert np.allclose(phi_map, expected)
+    # writing into a given buffer
+    out = np.full(expected.shape, np.nan)
+    res = gen.dfphi_map_array(phi, sens_names, sens_map, map_idx=map_idx, out=out)
+    assert res is out
+    assert np.allclose(out, expected)
+
+
+def test_SC_apply() -> None:
+    # 3 poles, 3 orders: pole 0 stable, pole 1 changes frequency, pole 2 is nan
+    Fn = np.array([[1.0, 1.0, 1.0], [2.0, 2.0, 2.5], [np.nan, np.nan, np.nan]])
+    Xi = np.full(Fn.shape, 0.02)
+    Phi = np.ones((3, 3, 2), dtype=complex)
+    Phi[1, :, 1] = -1.0
+    Lab = gen.SC_apply(Fn, Xi, Phi, 1, 3, 1, 0.05, 0.05, 0.02)
+    expected = np.array([[0, 1, 1], [0, 1, 0], [0, 0, 0]])
+    assert np.array_equal(Lab, expected)
@@ -381,3 +381,31 @@ def test_SSI_mpe() -> None:
             Lab=None,
             step=1,
         )
+
+
+def test_SSI_mpe_empty_selection() -> None:
+    """Test the SSI_mpe function with no selected frequency."""
+    rng = np.random.default_rng(0)
+    Fn_pol = rng.random((10, 11))
+    Sm_pol = rng.random((10, 11))
+    Ms_pol = rng.random((10, 11, 12))
+
+    Fn, Xi, Phi, order_out, Fn_std, Xi_std, Phi_std = ssi.SSI_mpe(
+        freq_ref=[],
+        Fn_pol=Fn_pol,
+        Xi_pol=Sm_pol,
+        Phi_pol=Ms_pol,
+        order=5,
+        step=1,
+        Fn_std=rng.random((10, 11)),
+        Xi_std=rng.random((10, 11)),
+        Phi_std=rng.random((10, 11, 12)),
+    )
+    assert Fn.shape == (0,)
+    assert Xi.shape == (0,)
+    # mode shapes keep the (number_of_channels, number_of_modes) layout
+    assert Phi.shape == (12, 0)
+    assert order_out == 5
+    assert Fn_std.shape == (0,)
+    assert Xi_std.shape == (0,)
+    assert Phi_std.shape == (12, 0)
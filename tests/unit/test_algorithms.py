@@ -1,8 +1,10 @@
 from typing import Any
 
+import numpy as np
 import pytest
-from pyoma2.algorithms import BaseAlgorithm
+from pyoma2.algorithms import FDD, BaseAlgorithm
 from pyoma2.algorithms.data.run_params import BaseRunParams
+from pyoma2.functions.fdd import SD_svals_db
 from pyoma2.setup import SingleSetup
 
 
@@ -134,3 +136,39 @@ def test_result_from_setup(fake_single_setup_fixture_with_param: SingleSetup):
             for algo in fake_single_setup_fixture_with_param.algorithms.values()
         ]
     )
+
+
+def test_fdd_singular_values_consistent_after_mpe():
+    """
+    Check that the FDD singular values and their dB values agree after the singular
+    vectors are computed for mpe.
+    """
+    rng = np.random.default_rng(0)
+    # fewer segments than channels: run takes the singular values from the segments
+    ss = SingleSetup(data=rng.standard_normal((1000, 12)), fs=100)
+    ss.add_algorithms(FDD(name="FDD", nxseg=256, method_SD="per"))
+    ss.run_all()
+    ss.mpe("FDD", sel_freq=[10.0])
+
+    result = ss["FDD"].result
+    assert result.S_vec is not None
+    assert np.array_equal(result.S_val_db, SD_svals_db(result.S_val))
+    assert np.isfinite(result.S_val_db).all()
+
+
+def test_run_does_not_keep_a_copy_of_the_data():
+    """
+    Check that run works on the data set on the algorithm, without keeping a copy of
+    it on the instance.
+    """
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((1000, 4))
+    algo = FDD(name="FDD", nxseg=256, method_SD="per")
+    algo._set_data(data=data, fs=100)
+    # run directly, without the checks of _pre_run
+    result = algo.run()
+    assert result.S_val.shape[:2] == (4, 4)
+    assert not any(
+        isinstance(value, np.ndarray) and value is not data
+        for value in vars(algo).values()
+    )